@@ -1,8 +1,9 @@
 import datetime
+from contextlib import ExitStack
 
 import flask_login
 
-from flask import Flask, render_template, make_response, request, redirect, session
+from flask import Flask, render_template, make_response, request, redirect, session, g
 from flask_compress import Compress
 
 from apscheduler.schedulers.background import BackgroundScheduler
@@ -12,7 +13,7 @@ from google.cloud import ndb
 from SlothAI.web.site import site
 from SlothAI.web.auth import auth
 from SlothAI.web.cron import cron
-from SlothAI.web.tasks import tasks
+from SlothAI.web.tasks import tasks, run_task
 
 from SlothAI.web.pipelines import pipeline
 from SlothAI.web.nodes import node_handler
@@ -20,14 +21,17 @@ from SlothAI.web.settings import settings_handler
 from SlothAI.web.templates import template_handler
 from SlothAI.web.custom_commands import custom_commands
 from SlothAI.web.callback import callback
+from SlothAI.web.admin import admin
 
-from SlothAI.web.models import User, Log
+from SlothAI.web.models import User, Log, ndb_context
 
 import config as config 
 
 from SlothAI.lib.services import TaskService, TemplateService
-from SlothAI.lib.storage import NDBTaskStore, NDBTemplateStore
-from SlothAI.lib.queue import AppEngineTaskQueue
+from SlothAI.lib.storage import NDBTaskStore, NDBTemplateStore, SQLiteTaskStore
+from SlothAI.lib.queue import AppEngineTaskQueue, LocalTaskQueue
+from SlothAI.lib.blobs import GCSBlobStore, LocalBlobStore
+from SlothAI.lib.embeddings import BlobEmbeddingCache, SQLiteEmbeddingCache
 
 def create_app(conf='dev'):
 
@@ -53,19 +57,55 @@ def create_app(conf='dev'):
     login_manager.session_protection = "strong"
     login_manager.login_message = u""
 
-    # client connection
-    client = ndb.Client()
+    # tasks are kept in Datastore unless a local SQLite store is configured
+    if app.config.get('TASK_STORE') == "sqlite":
+        task_store = SQLiteTaskStore(path=app.config.get('TASK_STORE_PATH', "tasks.db"))
+    else:
+        task_store = NDBTaskStore()
 
-    ndb_task_store = NDBTaskStore()
     ndb_template_store = NDBTemplateStore()
-    app_engine_queue = AppEngineTaskQueue()
 
-    task_service = TaskService(task_store=ndb_task_store, task_queue=app_engine_queue)
+    # tasks run through Cloud Tasks unless an in-process queue is configured
+    if app.config.get('TASK_QUEUE') == "local":
+        def run_local_task(task):
+            # one ndb context for the whole task, like a request gets
+            with ndb_context():
+                return run_task(task)
+
+        task_queue = LocalTaskQueue(
+            app,
+            handler=run_local_task,
+            workers=app.config.get('LOCAL_QUEUE_WORKERS', 4),
+            capacity=app.config.get('LOCAL_QUEUE_CAPACITY', 1000),
+            timeout=app.config.get('LOCAL_QUEUE_TIMEOUT', 30)
+        )
+    else:
+        task_queue = AppEngineTaskQueue()
+
+    task_service = TaskService(task_store=task_store, task_queue=task_queue)
     template_service = TemplateService(template_store=ndb_template_store)
 
     app.config['task_service'] = task_service
     app.config['template_service'] = template_service
 
+    # large task document fields are spilled to a blob store when one is configured
+    if app.config.get('TASK_BLOB_STORE') == "gcs":
+        app.config['blob_store'] = GCSBlobStore(app.config['CLOUD_STORAGE_BUCKET'])
+    elif app.config.get('TASK_BLOB_STORE') == "local":
+        app.config['blob_store'] = LocalBlobStore(app.config.get('TASK_BLOB_PATH', "task_blobs"))
+    else:
+        app.config['blob_store'] = None
+
+    # embeddings are cached by model, task type and text when a cache is configured
+    if app.config.get('EMBEDDING_CACHE') == "gcs":
+        app.config['embedding_cache'] = BlobEmbeddingCache(GCSBlobStore(app.config['CLOUD_STORAGE_BUCKET'], prefix="embedding_cache/"))
+    elif app.config.get('EMBEDDING_CACHE') == "local":
+        app.config['embedding_cache'] = BlobEmbeddingCache(LocalBlobStore(app.config.get('EMBEDDING_CACHE_PATH', "embedding_cache")))
+    elif app.config.get('EMBEDDING_CACHE') == "sqlite":
+        app.config['embedding_cache'] = SQLiteEmbeddingCache(app.config.get('EMBEDDING_CACHE_PATH', "embedding_cache.db"))
+    else:
+        app.config['embedding_cache'] = None
+
     def clean_logs():
         Log.delete_older_than(hours=1)
         # app.logger.info('ran background process to delete old callback logs')
@@ -78,8 +118,33 @@ def create_app(conf='dev'):
     _ = scheduler.add_job(clean_logs, 'interval', minutes=5)
     _ = scheduler.add_job(clean_tasks, 'interval', minutes=5)
 
+    if app.config['blob_store']:
+        def clean_blobs():
+            # outlives the tasks, which are cleaned after an hour
+            app.config['blob_store'].delete_older_than(hours=2)
+
+        _ = scheduler.add_job(clean_blobs, 'interval', minutes=30)
+
+    if app.config['embedding_cache']:
+        def clean_embeddings():
+            app.config['embedding_cache'].delete_older_than(hours=24 * int(app.config.get('EMBEDDING_CACHE_DAYS', 30)))
+
+        _ = scheduler.add_job(clean_embeddings, 'interval', hours=6)
+
     scheduler.start()
 
+    # one ndb context per request, shared by all the model calls it makes
+    @app.before_request
+    def open_ndb_context():
+        g.ndb_context = ExitStack()
+        g.ndb_context.enter_context(ndb_context())
+
+    @app.teardown_request
+    def close_ndb_context(exception=None):
+        context = g.pop('ndb_context', None)
+        if context:
+            context.close()
+
     @login_manager.request_loader
     def load_request(request):
         # get a token, if there is one
@@ -88,7 +153,7 @@ def create_app(conf='dev'):
             token = request.form.get('token')
 
         if token:
-            with client.context():
+            with ndb_context():
                 user = User.query().filter(User.api_token==token).get()
             return user
         else:
@@ -98,7 +163,7 @@ def create_app(conf='dev'):
     def load_user(uid):
         try:
             # get the user
-            with client.context():
+            with ndb_context():
                 if uid != "anonymous":
                     user = User.query().filter(User.uid==uid).get()
 
@@ -123,6 +188,7 @@ def create_app(conf='dev'):
         app.register_blueprint(template_handler)
         app.register_blueprint(custom_commands)
         app.register_blueprint(callback)
+        app.register_blueprint(admin)
 
     login_manager.blueprint_login_views = {
         'site': "/login",
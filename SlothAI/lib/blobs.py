@@ -0,0 +1,209 @@
+import os
+import json
+import time
+import zlib
+import hashlib
+import datetime
+
+from abc import ABC, abstractmethod
+
+from google.cloud import storage
+
+from SlothAI.lib.cache import LRUCache
+
+class AbstractBlobStore(ABC):
+	@abstractmethod
+	def put(self, key: str, data: bytes):
+		pass
+
+	@abstractmethod
+	def get(self, key: str) -> bytes:
+		pass
+
+	@abstractmethod
+	def delete_older_than(self, hours=0, minutes=0, seconds=0):
+		pass
+
+
+class GCSBlobStore(AbstractBlobStore):
+    def __init__(self, bucket_name, prefix="task_blobs/"):
+        self.bucket_name = bucket_name
+        self.prefix = prefix
+        self._client = None
+
+    def _bucket(self):
+        if self._client is None:
+            self._client = storage.Client()
+        return self._client.bucket(self.bucket_name)
+
+    def put(self, key, data):
+        blob = self._bucket().blob(f"{self.prefix}{key}")
+        blob.upload_from_string(data, content_type="application/octet-stream")
+
+    def get(self, key):
+        return self._bucket().blob(f"{self.prefix}{key}").download_as_bytes()
+
+    def delete_older_than(self, hours=0, minutes=0, seconds=0):
+        threshold = datetime.datetime.now(datetime.timezone.utc) - \
+            datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds)
+        for blob in self._bucket().list_blobs(prefix=self.prefix):
+            if blob.time_created and blob.time_created < threshold:
+                blob.delete()
+
+
+class LocalBlobStore(AbstractBlobStore):
+    def __init__(self, path="task_blobs"):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+
+    def put(self, key, data):
+        # write then rename, so readers never see a partial blob
+        filename = os.path.join(self.path, key)
+        with open(f"{filename}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{filename}.tmp", filename)
+
+    def get(self, key):
+        with open(os.path.join(self.path, key), "rb") as f:
+            return f.read()
+
+    def delete_older_than(self, hours=0, minutes=0, seconds=0):
+        threshold = time.time() - datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds).total_seconds()
+        for name in os.listdir(self.path):
+            filename = os.path.join(self.path, name)
+            if os.path.getmtime(filename) < threshold:
+                os.remove(filename)
+
+
+# blobs are content addressed. keys written or read recently don't need to be
+# uploaded again when an unchanged field is spilled on the next hop.
+KNOWN_BLOB_SECONDS = 15 * 60
+known_blobs = LRUCache(maxsize=4096)
+
+def _remember(key):
+    known_blobs.put(key, time.monotonic())
+
+def _is_known(key):
+    seen = known_blobs.get(key)
+    return seen is not None and time.monotonic() - seen < KNOWN_BLOB_SECONDS
+
+
+class BlobRef:
+    """
+    Reference to a document field that was spilled to a blob store.
+    """
+    def __init__(self, key, size):
+        self.key = key
+        self.size = size
+
+    def load(self, blob_store):
+        value = json.loads(zlib.decompress(blob_store.get(self.key)))
+        _remember(self.key)
+        return value
+
+    def to_wire(self):
+        return {"__blob__": self.key, "size": self.size}
+
+    @staticmethod
+    def from_wire(value):
+        if isinstance(value, dict) and len(value) == 2 and "__blob__" in value and "size" in value:
+            return BlobRef(value["__blob__"], value["size"])
+        return None
+
+
+class LazyDocument(dict):
+    """
+    Task document whose spilled fields are fetched from the blob store the first
+    time they are read. A loaded value replaces its reference in the document.
+    """
+    def __init__(self, data, blob_store):
+        super().__init__(data)
+        self.blob_store = blob_store
+
+    @classmethod
+    def from_wire(cls, document, blob_store):
+        refs = {}
+        for key, value in document.items():
+            ref = BlobRef.from_wire(value)
+            if ref:
+                refs[key] = ref
+        if not refs:
+            return document
+        return cls({**document, **refs}, blob_store)
+
+    def _resolve(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, BlobRef):
+            value = value.load(self.blob_store)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def raw(self, key):
+        # the stored value, which may still be a BlobRef
+        return dict.__getitem__(self, key)
+
+    def __getitem__(self, key):
+        return self._resolve(key)
+
+    # overriding __iter__ keeps dict(), update() and ** unpacking on the
+    # keys() / __getitem__ path, so references never leak out
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def get(self, key, default=None):
+        if key in self:
+            return self._resolve(key)
+        return default
+
+    def pop(self, key, *default):
+        if key in self:
+            value = self._resolve(key)
+            dict.__delitem__(self, key)
+            return value
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if key in self:
+            return self._resolve(key)
+        dict.__setitem__(self, key, default)
+        return default
+
+    def items(self):
+        return [(key, self._resolve(key)) for key in list(dict.keys(self))]
+
+    def values(self):
+        return [self._resolve(key) for key in list(dict.keys(self))]
+
+    def copy(self):
+        return LazyDocument(dict.copy(self), self.blob_store)
+
+    def __reduce__(self):
+        # pickles and deep copies as a plain, fully loaded dict
+        return (dict, (dict(self.items()),))
+
+
+def spill_document(document, blob_store, threshold):
+    """
+    Returns a copy of the document that is safe to serialize, with every field
+    whose JSON encoding is larger than `threshold` bytes replaced by a blob
+    reference. Fields that were never loaded keep their existing reference.
+    """
+    spilled = {}
+    for key in list(dict.keys(document)):
+        value = dict.__getitem__(document, key)
+        if isinstance(value, BlobRef):
+            spilled[key] = value.to_wire()
+            continue
+
+        encoded = json.dumps(value, separators=(',', ':')).encode('utf-8')
+        if len(encoded) <= threshold:
+            spilled[key] = value
+            continue
+
+        blob_key = hashlib.sha256(encoded).hexdigest()
+        if not _is_known(blob_key):
+            blob_store.put(blob_key, zlib.compress(encoded))
+            _remember(blob_key)
+        spilled[key] = BlobRef(blob_key, len(encoded)).to_wire()
+
+    return spilled
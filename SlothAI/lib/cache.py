@@ -0,0 +1,92 @@
+import sys
+import threading
+
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread safe, size bounded LRU cache with hit/miss counters.
+
+    Entries may carry a version stamp. A lookup made with a different version
+    than the one an entry was stored under counts as a miss and drops the entry.
+
+    With `maxbytes` set, the cache also evicts until the values' sizes, as
+    measured by `sizeof`, add up to no more than that.
+    """
+    def __init__(self, maxsize=1024, maxbytes=None, sizeof=sys.getsizeof):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.sizeof = sizeof
+        self._entries = OrderedDict()
+        self._sizes = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != version:
+                if entry is not None:
+                    self._remove(key)
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def peek(self, key):
+        # returns (version, value) without touching the counters or the order
+        with self._lock:
+            return self._entries.get(key)
+
+    def put(self, key, value, version=None):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (version, value)
+            if self.maxbytes is not None:
+                self._sizes[key] = self.sizeof(value)
+                self._bytes += self._sizes[key]
+
+            while len(self._entries) > self.maxsize or (self.maxbytes is not None and self._bytes > self.maxbytes and self._entries):
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key):
+        del self._entries[key]
+        self._bytes -= self._sizes.pop(key, 0)
+
+    def delete(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sizes.clear()
+            self._bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            stats = {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+            if self.maxbytes is not None:
+                stats["bytes"] = self._bytes
+                stats["maxbytes"] = self.maxbytes
+            return stats
@@ -0,0 +1,148 @@
+"""
+Streaming CSV reading for read_file. Files are read in chunks of rows, so a
+CSV of any size is turned into bounded windows of typed columns.
+"""
+
+import pandas as pd
+
+# rows pandas parses at a time
+CSV_CHUNK_ROWS = 10000
+
+# bytes read from storage at a time
+CSV_READ_CHUNK_BYTES = 8 * 1024 * 1024
+
+_integer_pattern = r'[+-]?\d+'
+
+
+def read_csv_frames(stream, prepend_string="", chunk_rows=CSV_CHUNK_ROWS):
+    """
+    Yields DataFrames of the data rows of a CSV stream, as strings with None for
+    missing values. The first row with no empty cells is the header. Rows
+    before it and rows that are entirely empty are dropped.
+    """
+    try:
+        reader = pd.read_csv(stream, header=None, dtype=str, chunksize=chunk_rows)
+    except pd.errors.EmptyDataError:
+        return
+
+    columns = None
+    with reader:
+        for chunk in reader:
+            if columns is None:
+                complete = chunk.notna().all(axis=1).to_numpy()
+                header = int(complete.argmax())
+                columns = [prepend_string + str(column).replace(' ', '_') for column in chunk.iloc[header]]
+                chunk = chunk.iloc[header + 1:]
+
+            chunk = chunk.dropna(how='all')
+            chunk.columns = columns
+            if len(chunk):
+                yield chunk
+
+
+def column_kind(values):
+    # the type every present value of a column parses as
+    if values.empty:
+        return None
+    if values.str.fullmatch(_integer_pattern).all():
+        return 'int'
+    if pd.to_numeric(values, errors='coerce').notna().all():
+        return 'float'
+    return 'string'
+
+
+def column_values(series, kind=None):
+    """
+    Returns a column as a list of ints, floats or strings, and its type. The
+    type is `kind` when the values fit it, as for a column typed by an earlier
+    window, otherwise the one every value parses as. Missing values become 0,
+    0.0 or "", and an untyped column with no values stays a list of None.
+    """
+    present = series.notna()
+    values = series[present].str.strip()
+    inferred = column_kind(values)
+
+    if inferred is None:
+        kind = kind
+    elif kind == 'float' and inferred == 'int':
+        pass
+    elif kind != 'string':
+        kind = inferred
+
+    if kind == 'int':
+        try:
+            column = pd.Series(0, index=series.index, dtype='int64')
+            column[present] = values.astype('int64')
+            return column.tolist(), kind
+        except (OverflowError, ValueError):
+            # wider than int64, handled as floats
+            kind = 'float'
+
+    if kind == 'float':
+        column = pd.Series(0.0, index=series.index, dtype='float64')
+        column[present] = pd.to_numeric(values)
+        return column.tolist(), kind
+
+    if kind == 'string':
+        return series.where(present, "").tolist(), kind
+
+    return [None] * len(series), kind
+
+
+def frame_to_columns(frame, kinds):
+    # kinds holds each column's type, set by the first window that has values
+    columns = {}
+    for i, column in enumerate(frame.columns):
+        columns[column], kinds[column] = column_values(frame.iloc[:, i], kinds.get(column))
+    return columns
+
+
+def csv_windows(stream, window_rows=None, prepend_string="", start=0, count=0):
+    """
+    Yields (offset, columns) for consecutive windows of `window_rows` data rows,
+    where offset is the index of the window's first row and columns maps each
+    column name to its typed values. Reading starts at data row `start` and
+    stops after `count` rows, if count is set. Without `window_rows` the rows
+    are returned as a single window.
+
+    Column types are kept from the first window, so later windows don't turn
+    a float column into ints. A window with values that don't fit keeps the
+    type its own values have.
+    """
+    kinds = {}
+    pending = []
+    pending_rows = 0
+    offset = start
+    skip = start
+    remaining = count or None
+
+    for frame in read_csv_frames(stream, prepend_string=prepend_string, chunk_rows=min(window_rows or CSV_CHUNK_ROWS, CSV_CHUNK_ROWS)):
+        if skip:
+            skipped = min(skip, len(frame))
+            frame = frame.iloc[skipped:]
+            skip -= skipped
+        if remaining is not None:
+            frame = frame.iloc[:remaining]
+            remaining -= len(frame)
+
+        if len(frame):
+            pending.append(frame)
+            pending_rows += len(frame)
+
+        while window_rows and pending_rows >= window_rows:
+            rows = pd.concat(pending)
+            yield offset, frame_to_columns(rows.iloc[:window_rows], kinds)
+            pending = [rows.iloc[window_rows:]]
+            pending_rows -= window_rows
+            offset += window_rows
+
+        if remaining == 0:
+            break
+
+    if pending_rows:
+        yield offset, frame_to_columns(pd.concat(pending), kinds)
+
+
+def csv_texts(columns):
+    # one "column:value,value,..." text per column, as read_file reports them
+    return [f"{key}:{','.join(map(str, values))}" for key, values in columns.items()]
@@ -4,16 +4,142 @@ featurebase client library.
 """
 
 import featurebase
+from featurebase.client import result as featurebase_result
+import requests
+import urllib.request
 from urllib.error import HTTPError, URLError, ContentTooShortError
 
 from flask import current_app as app
 
 import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from SlothAI.lib.cache import LRUCache
 
 ###############
 # FeatureBase #
 ###############
 
+class QueryError(str):
+    """
+    Error message returned by the FeatureBase query functions. `retriable` is
+    True when the request failed (connection errors, timeouts, 429 and 5xx
+    responses) and False when FeatureBase answered and rejected the query.
+    `status` is the HTTP status, if there was one.
+    """
+    def __new__(cls, message, retriable=False, status=None):
+        err = super().__new__(cls, message)
+        err.retriable = retriable
+        err.status = status
+        return err
+
+
+def is_retriable(err):
+    return getattr(err, 'retriable', False)
+
+
+def request_error(err):
+    # a QueryError for an exception raised while sending a query
+    if isinstance(err, HTTPError):
+        return QueryError(f"featurebase_query: exception: {err.reason}", retriable=err.code == 429 or err.code >= 500, status=err.code)
+    return QueryError(f"featurebase_query: exception: {getattr(err, 'reason', err)}", retriable=True)
+
+
+class PooledClient(featurebase.client):
+    """
+    FeatureBase client that posts through a keep-alive requests session, so
+    queries to the same database reuse their connections.
+    """
+    def __init__(self, hostport, database=None, apikey=None, timeout=None):
+        super().__init__(hostport=hostport, database=database, apikey=apikey, timeout=timeout)
+        self.url = self._geturl()
+        self.headers = dict(self._addheaders(urllib.request.Request(self.url)).header_items())
+        self.session = requests.Session()
+        # one connection per thread of a bulk insert or querybatch
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=32)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def _post(self, sql):
+        response = self.session.post(self.url, data=sql.encode('utf-8'), headers=self.headers, timeout=self.timeout)
+        if response.status_code >= 400:
+            # the same error urlopen raises, which featurebase_query reports
+            raise HTTPError(self.url, response.status_code, response.reason, response.headers, None)
+        return featurebase_result(sql=sql, response=response.content, code=response.status_code)
+
+    def close(self):
+        self.session.close()
+
+
+class FeatureBaseClientPool:
+    """
+    Thread safe pool of FeatureBase clients keyed by (endpoint, dbid, token).
+    Holds at most `maxsize` clients and closes the ones that haven't been used
+    for `idle_seconds`.
+    """
+    def __init__(self, maxsize=64, idle_seconds=300):
+        self.maxsize = maxsize
+        self.idle_seconds = idle_seconds
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+
+    def get(self, hostport, dbid, db_token):
+        key = (hostport, dbid, db_token)
+        now = time.monotonic()
+        with self._lock:
+            self._evict_idle(now)
+
+            entry = self._clients.get(key)
+            if entry:
+                entry[1] = now
+                self._clients.move_to_end(key)
+                self.reused += 1
+                return entry[0]
+
+            client = PooledClient(hostport=hostport, database=dbid, apikey=db_token)
+            self._clients[key] = [client, now]
+            self.created += 1
+            while len(self._clients) > self.maxsize:
+                _, (evicted, _) = self._clients.popitem(last=False)
+                evicted.close()
+                self.evicted += 1
+            return client
+
+    def _evict_idle(self, now):
+        # least recently used first, so stop at the first client still in use
+        while self._clients:
+            key, (client, last_used) = next(iter(self._clients.items()))
+            if now - last_used <= self.idle_seconds:
+                break
+            del self._clients[key]
+            client.close()
+            self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            for client, _ in self._clients.values():
+                client.close()
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "maxsize": self.maxsize,
+                "idle_seconds": self.idle_seconds,
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted
+            }
+
+client_pool = FeatureBaseClientPool()
+
+
 def featurebase_query(document, debug=False):
     """
     Execute a query against FeatureBase cloud and return the response and any query errors.
@@ -35,11 +161,7 @@ def featurebase_query(document, debug=False):
     dbid = document.get('dbid')
     db_token = document.get('db_token')
 
-    fb_client = featurebase.client(
-        hostport=app.config['FEATUREBASE_ENDPOINT'],
-        database=dbid,
-        apikey=db_token
-    )
+    fb_client = client_pool.get(app.config['FEATUREBASE_ENDPOINT'], dbid, db_token)
 
     if debug:
         print(f"dbid: {fb_client.database}")
@@ -53,10 +175,10 @@ def featurebase_query(document, debug=False):
                     partial_query = sql[:100]
                 else:
                     partial_query = sql             
-                return None, f"featurebase_query: {partial_query}... :{resp.error}"
+                return None, QueryError(f"featurebase_query: {partial_query}... :{resp.error}")
         return resp, None
     except (HTTPError, URLError, ContentTooShortError, Exception)  as err:
-        return None, f"featurebase_query: exception: {err.reason}"
+        return None, request_error(err)
 
 
 def featurebase_querybatch(document, debug=False):
@@ -80,11 +202,7 @@ def featurebase_querybatch(document, debug=False):
     dbid = document.get('dbid')
     db_token = document.get('db_token')
 
-    fb_client = featurebase.client(
-        hostport=app.config['FEATUREBASE_ENDPOINT'],
-        database=dbid,
-        apikey=db_token
-    )
+    fb_client = client_pool.get(app.config['FEATUREBASE_ENDPOINT'], dbid, db_token)
 
     if debug:
         print(f"dbid: {fb_client.database}")
@@ -102,11 +220,117 @@ def featurebase_querybatch(document, debug=False):
         else:
             return results, errs
     except (HTTPError, URLError, ContentTooShortError)  as err:
-        return None, f"featurebase_query: {err.reason}"
+        return None, f"featurebase_query: {getattr(err, 'reason', err)}"
     except Exception as e:
         return None, f"featurebase_query: unhandled excpetion while running query: {e}"
 
 
+def insert_chunks(table, columns, records, max_bytes, written=()):
+    """
+    Groups records into INSERT statements of at most `max_bytes` bytes. A
+    record larger than that gets a statement of its own. Records inside the
+    [start, stop) ranges in `written` are left out.
+
+    Returns a list of (start, stop, sql) tuples, in record order.
+    """
+    prefix = f"INSERT INTO {table} ({','.join(columns)}) VALUES "
+    skip = set()
+    for start, stop in written:
+        skip.update(range(start, stop))
+
+    chunks = []
+    chunk = []
+    chunk_start = 0
+    chunk_bytes = len(prefix) + 1
+
+    def close(stop):
+        if chunk:
+            chunks.append((chunk_start, stop, prefix + ",".join(chunk) + ";"))
+
+    for i, record in enumerate(records):
+        if i in skip:
+            close(i)
+            chunk = []
+            continue
+
+        size = len(record.encode('utf-8')) + 1
+        if chunk and chunk_bytes + size > max_bytes:
+            close(i)
+            chunk = []
+
+        if not chunk:
+            chunk_start = i
+            chunk_bytes = len(prefix) + 1
+
+        chunk.append(record)
+        chunk_bytes += size
+
+    close(len(records))
+    return chunks
+
+
+def featurebase_bulk_insert(table, columns, records, auth, max_bytes=1000000, workers=8, attempts=3, written=()):
+    """
+    Insert records into a FeatureBase table as several size bounded statements
+    sent concurrently. Each statement is retried on its own when the request
+    fails. SQL errors are not retried.
+
+    Args:
+    - table (str): The table to insert into.
+    - columns (list): Column names, as returned by process_data_dict_for_insert.
+    - records (list): Value tuples, as returned by process_data_dict_for_insert.
+    - auth (dict): 'dbid' and 'db_token'.
+    - max_bytes (int, optional): Largest statement to send.
+    - workers (int, optional): Statements in flight at once.
+    - attempts (int, optional): Tries per statement for request failures.
+    - written (list, optional): [start, stop) record ranges already inserted.
+
+    Returns:
+    Tuple:
+        - stats (list): One dict per statement with the 'start' and 'stop' record
+          index, 'bytes', 'attempts', 'seconds' and 'error' (None when inserted).
+        - errors (list): QueryErrors of the failed statements, or None.
+    """
+    chunks = insert_chunks(table, columns, records, max_bytes, written)
+
+    # the workers run outside the request, so they get their own app context
+    flask_app = app._get_current_object()
+
+    def _insert(start, stop, sql):
+        started = time.monotonic()
+        err = None
+        for attempt in range(1, attempts + 1):
+            with flask_app.app_context():
+                try:
+                    _, err = featurebase_query({"sql": sql, "dbid": auth.get('dbid'), "db_token": auth.get('db_token')})
+                except Exception as ex:
+                    err = request_error(ex)
+
+            # only failed requests are worth sending again
+            if not err or not is_retriable(err) or attempt == attempts:
+                break
+            time.sleep(0.5 * 2 ** (attempt - 1))
+
+        return {
+            "start": start,
+            "stop": stop,
+            "bytes": len(sql.encode('utf-8')),
+            "attempts": attempt,
+            "seconds": round(time.monotonic() - started, 3),
+            "error": err
+        }
+
+    if not chunks:
+        return [], None
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(chunks)))) as executor:
+        futures = [executor.submit(_insert, *chunk) for chunk in chunks]
+        stats = [future.result() for future in futures]
+
+    errors = [stat['error'] for stat in stats if stat['error']]
+    return stats, errors or None
+
+
 def create_table(name, schema, auth):
     """
     Create a table in Featurebase Cloud with the specified name and schema.
@@ -154,6 +378,8 @@ def drop_table(name, auth):
         }
     )
 
+    forget_columns(name, auth)
+
     if err:
         print(f"Error dropping table {name} on FeatureBase Cloud: {err}")
     else:
@@ -224,6 +450,33 @@ def get_columns(table_name, auth):
         
     return columns, None
 
+# column types per (dbid, table), so steady state writes skip SHOW TABLES and
+# SHOW COLUMNS. entries are refreshed after SCHEMA_CACHE_SECONDS.
+SCHEMA_CACHE_SECONDS = 300
+schema_cache = LRUCache(maxsize=1024)
+
+def cached_columns(table_name, auth):
+    """
+    Returns a copy of the cached column type map for a table, or None if the
+    table isn't cached or the entry is older than SCHEMA_CACHE_SECONDS.
+    """
+    entry = schema_cache.get((auth.get('dbid'), table_name))
+    if entry is None:
+        return None
+
+    cached_at, columns = entry
+    if time.monotonic() - cached_at > SCHEMA_CACHE_SECONDS:
+        schema_cache.delete((auth.get('dbid'), table_name))
+        return None
+
+    return dict(columns)
+
+def remember_columns(table_name, auth, columns):
+    schema_cache.put((auth.get('dbid'), table_name), (time.monotonic(), dict(columns)))
+
+def forget_columns(table_name, auth):
+    schema_cache.delete((auth.get('dbid'), table_name))
+
 def add_column(table_name, column, auth):
     """
     Add a new column to a specified table in a database using Featurebase.
@@ -394,93 +647,212 @@ import weaviate
 import weaviate.classes as wvc
 
 from uuid import uuid4
+from contextlib import contextmanager
 
 
-def weaviate_delete_collection(weaviate_collection_name, auth=None):
-    client = weaviate.connect_to_wcs(
-        cluster_url=auth.get('weaviate_url'),
-        auth_credentials=weaviate.auth.AuthApiKey(auth.get('weaviate_token'))
-    )
+class PooledWeaviateClient:
+    def __init__(self, key, client, now):
+        self.key = key
+        self.client = client
+        self.last_used = now
+        self.checked = now
+        self.users = 0
+        self.discarded = False
+
+
+class WeaviateConnectionPool:
+    """
+    Keeps a connected Weaviate client per (cluster_url, token), so searches and
+    inserts don't connect and check readiness on every call. Clients are checked
+    with is_ready() when they haven't been for `check_seconds`, closed after
+    `idle_seconds` unused, and at most `maxsize` idle clients are kept.
+    """
+    def __init__(self, maxsize=16, idle_seconds=300, check_seconds=30):
+        self.maxsize = maxsize
+        self.idle_seconds = idle_seconds
+        self.check_seconds = check_seconds
+        self._clients = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self.failed_checks = 0
+
+    def acquire(self, cluster_url, token):
+        key = (cluster_url, token)
+        now = time.monotonic()
+        with self._lock:
+            self._evict(now)
+            entry = self._clients.get(key)
+            if entry:
+                entry.users += 1
+                entry.last_used = now
+                self._clients.move_to_end(key)
+
+        if entry:
+            if now - entry.checked < self.check_seconds or self.is_ready(entry.client):
+                entry.checked = now
+                self.reused += 1
+                return entry
+            self.failed_checks += 1
+            self.discard(entry)
+            self.release(entry)
+
+        # connecting is slow, so it happens outside the lock
+        client = weaviate.connect_to_wcs(
+            cluster_url=cluster_url,
+            auth_credentials=weaviate.auth.AuthApiKey(token)
+        )
+
+        with self._lock:
+            entry = self._clients.get(key)
+            if entry:
+                # another thread connected first
+                client.close()
+            else:
+                entry = PooledWeaviateClient(key, client, now)
+                self._clients[key] = entry
+                self.created += 1
+            entry.users += 1
+            self._evict(now)
+        return entry
+
+    def release(self, entry):
+        with self._lock:
+            entry.users -= 1
+            entry.last_used = time.monotonic()
+            if entry.discarded and entry.users == 0:
+                entry.client.close()
+
+    def discard(self, entry):
+        # the client is closed once the last user releases it
+        with self._lock:
+            if self._clients.get(entry.key) is entry:
+                del self._clients[entry.key]
+            entry.discarded = True
+
+    def is_ready(self, client):
+        try:
+            return client.is_ready()
+        except Exception:
+            return False
+
+    def _evict(self, now):
+        # clients in use are never closed here
+        for key, entry in list(self._clients.items()):
+            idle = now - entry.last_used > self.idle_seconds
+            if entry.users == 0 and (idle or len(self._clients) > self.maxsize):
+                del self._clients[key]
+                entry.client.close()
+                self.evicted += 1
+
+    def clear(self):
+        with self._lock:
+            for entry in self._clients.values():
+                entry.discarded = True
+                if entry.users == 0:
+                    entry.client.close()
+            self._clients.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "size": len(self._clients),
+                "maxsize": self.maxsize,
+                "in_use": sum(entry.users for entry in self._clients.values()),
+                "created": self.created,
+                "reused": self.reused,
+                "evicted": self.evicted,
+                "failed_checks": self.failed_checks
+            }
+
+weaviate_pool = WeaviateConnectionPool()
 
+
+@contextmanager
+def weaviate_connection(auth):
+    """
+    Yields a pooled client for the Weaviate cluster in `auth`. A client that
+    loses its connection is dropped from the pool.
+    """
+    entry = weaviate_pool.acquire(auth.get('weaviate_url'), auth.get('weaviate_token'))
+    try:
+        yield entry.client
+    except Exception as ex:
+        connection_lost = (weaviate.exceptions.WeaviateConnectionError, weaviate.exceptions.WeaviateClosedClientError)
+        if isinstance(ex, connection_lost) or not weaviate_pool.is_ready(entry.client):
+            weaviate_pool.discard(entry)
+        raise
+    finally:
+        weaviate_pool.release(entry)
+
+
+def weaviate_delete_collection(weaviate_collection_name, auth=None):
     try:
-        client.collections.delete(weaviate_collection_name)
+        with weaviate_connection(auth) as client:
+            client.collections.delete(weaviate_collection_name)
         time.sleep(4)
         return True
     except Exception as ex:
         return False
-    finally:
-        client.close()
 
 
 def weaviate_get_all_schemas(auth=None):
-    client = weaviate.connect_to_wcs(
-        cluster_url=auth.get('weaviate_url'),
-        auth_credentials=weaviate.auth.AuthApiKey(auth.get('weaviate_token'))
-    )
-
     try:
-        response = client.collections.list_all()
-        return response
+        with weaviate_connection(auth) as client:
+            response = client.collections.list_all()
+            return response
     except Exception as ex:
         print(f"An error occurred: {ex}")
         return None
-    finally:
-        client.close()
 
 
 def weaviate_batch(weaviate_collection_name, objects, auth, batch_size=200):
-    client = weaviate.connect_to_wcs(
-        cluster_url=auth.get('weaviate_url'),
-        auth_credentials=weaviate.auth.AuthApiKey(auth.get('weaviate_token'))
-    )
+    with weaviate_connection(auth) as client:
+        uuids = []
 
-    uuids = []
-
-    try:
-        # Check if the collection already exists
         try:
-            collection = client.collections.get(weaviate_collection_name)
-        except weaviate.exceptions.UnexpectedStatusCodeException as usce:
-            if usce.status_code == 404:
-                # Collection doesn't exist, create it
-                collection = client.collections.create(
-                    weaviate_collection_name,
-                    vector_index_config=wvc.config.Configure.VectorIndex.hnsw()
-                )
-            else:
-                raise usce
-
-        # Configure dynamic batching
-        with collection.batch.dynamic() as batch:
-            # All lists within the 'objects' dictionary have equal length
-            num_objects = len(next(iter(objects.values())))
-
-            for i in range(num_objects):
-                uuid = None
-                vector = {}
-                data_objects = {}
-
-                if "uuid" in objects:
-                    uuid = objects.get('uuid')[i]
+            # Check if the collection already exists
+            try:
+                collection = client.collections.get(weaviate_collection_name)
+            except weaviate.exceptions.UnexpectedStatusCodeException as usce:
+                if usce.status_code == 404:
+                    # Collection doesn't exist, create it
+                    collection = client.collections.create(
+                        weaviate_collection_name,
+                        vector_index_config=wvc.config.Configure.VectorIndex.hnsw()
+                    )
                 else:
-                    uuid = str(uuid4())
+                    raise usce
+
+            # Configure dynamic batching
+            with collection.batch.dynamic() as batch:
+                # All lists within the 'objects' dictionary have equal length
+                num_objects = len(next(iter(objects.values())))
 
-                uuids.append(uuid)
+                for i in range(num_objects):
+                    uuid = None
+                    vector = {}
+                    data_objects = {}
 
-                for key, value in objects.items():
-                    if 'embedding' in key:
-                        vector = value[i]
+                    if "uuid" in objects:
+                        uuid = objects.get('uuid')[i]
                     else:
-                        data_objects[key] = value[i]
+                        uuid = str(uuid4())
 
-                # Add to the Weaviate batch
-                batch.add_object(properties=data_objects, uuid=uuid, vector=vector)
+                    uuids.append(uuid)
 
-    except Exception as ex:
-        raise Exception(f"Weaviate insert failed: {ex}")
+                    for key, value in objects.items():
+                        if 'embedding' in key:
+                            vector = value[i]
+                        else:
+                            data_objects[key] = value[i]
 
-    finally:
-        client.close()
+                    # Add to the Weaviate batch
+                    batch.add_object(properties=data_objects, uuid=uuid, vector=vector)
+
+        except Exception as ex:
+            raise Exception(f"Weaviate insert failed: {ex}")
 
     return {
         'uuids': uuids,
@@ -488,6 +860,26 @@ def weaviate_batch(weaviate_collection_name, objects, auth, batch_size=200):
     }
 
 
+def weaviate_search_batch(search, searches, workers=8):
+    """
+    Runs `search` (weaviate_similarity or weaviate_hybrid_search) once for each
+    dict of keyword arguments in `searches`, at most `workers` at a time, over
+    the pooled clients. Returns the results in the order of `searches`.
+    """
+    if len(searches) < 2:
+        return [search(**kwargs) for kwargs in searches]
+
+    # the searches log through the app, so each thread gets an app context
+    flask_app = app._get_current_object()
+
+    def _search(kwargs):
+        with flask_app.app_context():
+            return search(**kwargs)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(searches)))) as executor:
+        return list(executor.map(_search, searches))
+
+
 # Will be upgraded to do schema comparisons
 def extract_weaviate_params(task_document):
     try:
@@ -573,56 +965,50 @@ def weaviate_similarity(
     auth=None
 ):
 
-    client = weaviate.connect_to_wcs(
-        cluster_url=auth.get('weaviate_url'),
-        auth_credentials=weaviate.auth.AuthApiKey(auth.get('weaviate_token'))
-    )
-
+    # errors leave the pooled connection first, so a broken client is dropped
     try:
-        collection = client.collections.get(weaviate_collection_name)
-
-        # Prepare the query parameters
-        query_params = {
-            'limit': limit,
-            'offset': offset
-        }
+        with weaviate_connection(auth) as client:
+            collection = client.collections.get(weaviate_collection_name)
 
-        # Add filters if provided
-        if filters:
-            query_params['filters'] = filters
+            # Prepare the query parameters
+            query_params = {
+                'limit': limit,
+                'offset': offset
+            }
 
-        # Add keyterms filter if provided
-        if keyterms:
-            keyterms_filter = wvc.query.Filter.by_property("keyterms").contains(keyterms)
+            # Add filters if provided
             if filters:
-                query_params['filters'] = filters & keyterms_filter
-            else:
-                query_params['filters'] = keyterms_filter
-
-        # Perform the similarity search using near_vector
-        response = collection.query.near_vector(
-            near_vector=query_vector,
-            return_metadata=wvc.query.MetadataQuery(distance=True),
-            **query_params
-        )
-
-        # Extract the search results
-        results = []
-        for o in response.objects:
-            result = {
-                'properties': o.properties,
-                'distance': o.metadata.distance
-            }
-            results.append(result)
+                query_params['filters'] = filters
 
-        return results
+            # Add keyterms filter if provided
+            if keyterms:
+                keyterms_filter = wvc.query.Filter.by_property("keyterms").contains(keyterms)
+                if filters:
+                    query_params['filters'] = filters & keyterms_filter
+                else:
+                    query_params['filters'] = keyterms_filter
+
+            # Perform the similarity search using near_vector
+            response = collection.query.near_vector(
+                near_vector=query_vector,
+                return_metadata=wvc.query.MetadataQuery(distance=True),
+                **query_params
+            )
+
+            # Extract the search results
+            results = []
+            for o in response.objects:
+                result = {
+                    'properties': o.properties,
+                    'distance': o.metadata.distance
+                }
+                results.append(result)
+
+            return results
 
     except Exception as ex:
         return False, {"error": str(ex)}
 
-    finally:
-        client.close()
-
 
 def weaviate_hybrid_search(
     weaviate_collection_name,
@@ -636,65 +1022,58 @@ def weaviate_hybrid_search(
     keyterms=None,
     auth=None
 ):
-    client = weaviate.connect_to_wcs(
-        cluster_url=auth.get('weaviate_url'),
-        auth_credentials=weaviate.auth.AuthApiKey(auth.get('weaviate_token'))
-    )
-
+    # errors leave the pooled connection first, so a broken client is dropped
     try:
-        collection = client.collections.get(weaviate_collection_name)
-
-        # Prepare the query parameters
-        query_params = {
-            'alpha': alpha,
-            'limit': limit,
-            'offset': offset
-        }
-
-        # Add the fusion type if provided
-        if fusion_type:
-            query_params['fusion_type'] = fusion_type
-        else:
-            query_params['fusion_type'] = wvc.query.HybridFusion.RELATIVE_SCORE
+        with weaviate_connection(auth) as client:
+            collection = client.collections.get(weaviate_collection_name)
 
-        # Add filters if provided
-        if filters:
-            query_params['filters'] = filters
+            # Prepare the query parameters
+            query_params = {
+                'alpha': alpha,
+                'limit': limit,
+                'offset': offset
+            }
 
-        # Add keyterms filter if provided
-        if keyterms:
-            keyterms_filter = wvc.query.Filter.by_property("keyterms").contains(keyterms)
-            if filters:
-                query_params['filters'] = filters & keyterms_filter
+            # Add the fusion type if provided
+            if fusion_type:
+                query_params['fusion_type'] = fusion_type
             else:
-                query_params['filters'] = keyterms_filter
-
-        app.logger.info(query_params)
+                query_params['fusion_type'] = wvc.query.HybridFusion.RELATIVE_SCORE
 
-        # Perform the hybrid search
-        response = collection.query.hybrid(
-            query=query,
-            vector=query_vector,
-            return_metadata=wvc.query.MetadataQuery(score=True, explain_score=True),
-            **query_params
-        )
-
-        # Extract the search results
-        results = []
-        for o in response.objects:
-            result = {
-                'properties': o.properties,
-                'score': o.metadata.score,
-                'explain_score': o.metadata.explain_score,
-                'fusion_type': str(query_params.get('fusion_type', wvc.query.HybridFusion.RELATIVE_SCORE))
-            }
-            results.append(result)
+            # Add filters if provided
+            if filters:
+                query_params['filters'] = filters
 
-        return results
+            # Add keyterms filter if provided
+            if keyterms:
+                keyterms_filter = wvc.query.Filter.by_property("keyterms").contains(keyterms)
+                if filters:
+                    query_params['filters'] = filters & keyterms_filter
+                else:
+                    query_params['filters'] = keyterms_filter
+
+            app.logger.info(query_params)
+
+            # Perform the hybrid search
+            response = collection.query.hybrid(
+                query=query,
+                vector=query_vector,
+                return_metadata=wvc.query.MetadataQuery(score=True, explain_score=True),
+                **query_params
+            )
+
+            # Extract the search results
+            results = []
+            for o in response.objects:
+                result = {
+                    'properties': o.properties,
+                    'score': o.metadata.score,
+                    'explain_score': o.metadata.explain_score,
+                    'fusion_type': str(query_params.get('fusion_type', wvc.query.HybridFusion.RELATIVE_SCORE))
+                }
+                results.append(result)
+
+            return results
 
     except Exception as ex:
         raise Exception(f"Hybrid search failed: {ex}")
-
-    finally:
-        client.close()
-
@@ -0,0 +1,287 @@
+import re
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+
+from abc import ABC, abstractmethod
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app as app
+
+from SlothAI.lib.tasks import RetriableError
+
+# request limits of the embedding APIs. token counts are estimated from the
+# text length, so max_tokens stays under what the providers accept.
+PROVIDER_LIMITS = {
+    "openai": {"max_inputs": 2048, "max_tokens": 250000},
+    "gemini": {"max_inputs": 100, "max_tokens": 100000},
+    "mistral": {"max_inputs": 128, "max_tokens": 12000},
+    "local": {"max_inputs": 64, "max_tokens": 50000},
+}
+
+DEFAULT_IN_FLIGHT = 4
+
+# requests in flight per provider and limit, shared by every task in the
+# process. nodes asking for a different limit get a semaphore of that size.
+_in_flight = {}
+_in_flight_lock = threading.Lock()
+
+
+def in_flight_limit(provider, limit):
+    with _in_flight_lock:
+        if (provider, limit) not in _in_flight:
+            _in_flight[(provider, limit)] = threading.BoundedSemaphore(limit)
+        return _in_flight[(provider, limit)]
+
+
+def estimate_tokens(text):
+    # about four characters per token for English text
+    return len(str(text)) // 4 + 1
+
+
+def pack_batches(texts, max_inputs, max_tokens):
+    """
+    Returns (start, stop) ranges over `texts`, each holding as many texts as fit
+    in `max_inputs` and `max_tokens`. A text larger than `max_tokens` gets a
+    batch of its own.
+    """
+    batches = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        size = estimate_tokens(text)
+        if i > start and (i - start >= max_inputs or tokens + size > max_tokens):
+            batches.append((start, i))
+            start = i
+            tokens = 0
+        tokens += size
+
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
+def is_rate_limited(ex):
+    # openai sets status_code, google api_core code, and mistral http_status
+    for attribute in ('status_code', 'code', 'http_status'):
+        if getattr(ex, attribute, None) == 429:
+            return True
+    return "429" in str(ex) or "rate limit" in str(ex).lower()
+
+
+def retry_after(ex, attempt):
+    headers = getattr(ex, 'headers', None) or getattr(getattr(ex, 'response', None), 'headers', None) or {}
+    try:
+        return min(float(headers.get('retry-after') or headers.get('Retry-After')), 60.0)
+    except (TypeError, ValueError):
+        return min(2 ** attempt, 30) + random.random()
+
+
+def embed_batches(embed, texts, provider, batch_size=None, in_flight=DEFAULT_IN_FLIGHT, attempts=5):
+    """
+    Embeds `texts` with `embed(batch) -> list of vectors`, sending packed batches
+    concurrently with at most `in_flight` requests to the provider at once.
+    Rate limited requests are retried with backoff. Returns the vectors in the
+    order of `texts`.
+    """
+    limits = PROVIDER_LIMITS[provider]
+    max_inputs = min(batch_size, limits['max_inputs']) if batch_size else limits['max_inputs']
+    batches = pack_batches(texts, max_inputs, limits['max_tokens'])
+    semaphore = in_flight_limit(provider, in_flight)
+
+    def _embed(batch):
+        start, stop = batch
+        for attempt in range(attempts):
+            with semaphore:
+                try:
+                    vectors = embed(texts[start:stop])
+                    break
+                except Exception as ex:
+                    if not is_rate_limited(ex):
+                        raise
+                    if attempt == attempts - 1:
+                        raise RetriableError(f"{provider} embeddings are rate limited: {ex}")
+                    delay = retry_after(ex, attempt)
+
+            # back off without holding a slot
+            time.sleep(delay)
+
+        if len(vectors) != stop - start:
+            raise Exception(f"{provider} returned {len(vectors)} embeddings for {stop - start} inputs")
+        return vectors
+
+    if len(batches) == 1:
+        return _embed(batches[0])
+
+    embeddings = []
+    with ThreadPoolExecutor(max_workers=min(in_flight, len(batches))) as executor:
+        for vectors in executor.map(_embed, batches):
+            embeddings.extend(vectors)
+    return embeddings
+
+
+def pack_vector(vector):
+    # float32, little-endian
+    packed = array('f', vector)
+    if sys.byteorder == 'big':
+        packed.byteswap()
+    return packed.tobytes()
+
+
+def unpack_vector(data):
+    vector = array('f')
+    vector.frombytes(data)
+    if sys.byteorder == 'big':
+        vector.byteswap()
+    return vector.tolist()
+
+
+def cache_key(model, task_type, text):
+    model = re.sub(r'[^A-Za-z0-9_.-]', '_', model)
+    digest = hashlib.sha256(str(text).encode('utf-8')).hexdigest()
+    return f"{model}-{task_type or 'default'}-{digest}"
+
+
+class AbstractEmbeddingCache(ABC):
+	@abstractmethod
+	def get_many(self, keys: list) -> dict:
+		pass
+
+	@abstractmethod
+	def put_many(self, vectors: dict):
+		pass
+
+	@abstractmethod
+	def delete_older_than(self, hours=0, minutes=0, seconds=0):
+		pass
+
+
+class SQLiteEmbeddingCache(AbstractEmbeddingCache):
+    """
+    Embedding cache in a local SQLite database. Hits refresh an entry's
+    used_at, so delete_older_than drops the least recently used vectors.
+    """
+    def __init__(self, path="embedding_cache.db"):
+        self.path = path
+        self._local = threading.local()
+        self._conn().execute("""
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB,
+                used_at REAL
+            )
+        """)
+        self._conn().execute("CREATE INDEX IF NOT EXISTS embeddings_used_at ON embeddings (used_at)")
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, keys):
+        found = {}
+        conn = self._conn()
+        # stay under sqlite's bound parameter limit
+        for i in range(0, len(keys), 500):
+            chunk = keys[i:i + 500]
+            marks = ",".join("?" * len(chunk))
+            rows = conn.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({marks})", chunk).fetchall()
+            found.update(rows)
+            if rows:
+                conn.execute(f"UPDATE embeddings SET used_at = ? WHERE key IN ({','.join('?' * len(rows))})", [time.time()] + [row[0] for row in rows])
+        return found
+
+    def put_many(self, vectors):
+        now = time.time()
+        conn = self._conn()
+        conn.execute("BEGIN")
+        conn.executemany("INSERT OR REPLACE INTO embeddings (key, vector, used_at) VALUES (?, ?, ?)", [(key, data, now) for key, data in vectors.items()])
+        conn.execute("COMMIT")
+
+    def delete_older_than(self, hours=0, minutes=0, seconds=0):
+        threshold = time.time() - (hours * 3600 + minutes * 60 + seconds)
+        self._conn().execute("DELETE FROM embeddings WHERE used_at < ?", (threshold,))
+
+
+class BlobEmbeddingCache(AbstractEmbeddingCache):
+    """
+    Embedding cache on a blob store (local disk or GCS), one blob per vector.
+    Entries expire by age through the blob store's delete_older_than.
+    """
+    def __init__(self, blob_store, workers=16):
+        self.blob_store = blob_store
+        self.workers = workers
+
+    def _get(self, key):
+        try:
+            return key, self.blob_store.get(key)
+        except Exception:
+            # missing or unreadable entries are misses
+            return key, None
+
+    def get_many(self, keys):
+        if not keys:
+            return {}
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(keys))) as executor:
+            return {key: data for key, data in executor.map(self._get, keys) if data is not None}
+
+    def put_many(self, vectors):
+        if not vectors:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.workers, len(vectors))) as executor:
+            list(executor.map(lambda item: self.blob_store.put(*item), vectors.items()))
+
+    def delete_older_than(self, hours=0, minutes=0, seconds=0):
+        self.blob_store.delete_older_than(hours=hours, minutes=minutes, seconds=seconds)
+
+
+def cached_embed_batches(embed, texts, provider, cache, model, task_type=None, **kwargs):
+    """
+    embed_batches() that looks every text up in `cache` first, keyed by
+    (model, task_type, sha256(text)), and only embeds the misses. Repeated
+    texts are embedded once. Every vector returned is float32, cached or not.
+    """
+    if cache is None:
+        return embed_batches(embed, texts, provider, **kwargs)
+
+    keys = [cache_key(model, task_type, text) for text in texts]
+    unique_keys = list(dict.fromkeys(keys))
+
+    try:
+        found = cache.get_many(unique_keys)
+    except Exception as ex:
+        app.logger.warning(f"embedding cache: lookup failed: {ex}")
+        found = {}
+
+    vectors = {key: unpack_vector(data) for key, data in found.items()}
+
+    # first text for each key that wasn't found
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in vectors and key not in missing:
+            missing[key] = text
+
+    if missing:
+        embedded = embed_batches(embed, list(missing.values()), provider, **kwargs)
+        packed = {key: pack_vector(vector) for key, vector in zip(missing.keys(), embedded)}
+
+        # new vectors are rounded to float32 too, so a text gets the same
+        # vector whether or not it was cached
+        vectors.update((key, unpack_vector(data)) for key, data in packed.items())
+
+        try:
+            cache.put_many(packed)
+        except Exception as ex:
+            app.logger.warning(f"embedding cache: store failed: {ex}")
+
+    app.logger.info(f"embedding cache: {sum(1 for key in keys if key in found)} of {len(texts)} texts cached, embedded {len(missing)}.")
+
+    return [vectors[key] for key in keys]
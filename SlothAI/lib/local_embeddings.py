@@ -0,0 +1,54 @@
+"""
+In-process CPU embeddings for the embedding processor, selected with a model
+extra of "local:<name>", like "local:all-MiniLM-L6-v2". Models are loaded with
+sentence-transformers, an optional install (requirements-local.txt).
+"local:hashing" is a dependency free feature hashing model, used by the tests.
+
+Models run in a pool of worker processes, each loading its model once. The
+worker functions live in workers.embeddings, so workers don't load the app.
+"""
+
+import threading
+import importlib.util
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+from workers.embeddings import HashingEmbedder, load_model, encode
+
+LOCAL_MODEL_PREFIX = "local:"
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+def local_model_name(model):
+    return model[len(LOCAL_MODEL_PREFIX):]
+
+def is_available(name):
+    return name == "hashing" or importlib.util.find_spec("sentence_transformers") is not None
+
+def _pool(name, workers):
+    with _pools_lock:
+        if name not in _pools:
+            # spawned, not forked, as the app process runs threads
+            _pools[name] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=load_model,
+                initargs=(name,)
+            )
+        return _pools[name]
+
+def embed_local(name, texts, workers=1):
+    """
+    Embeds `texts` with the local model `name` in its worker pool and returns
+    the vectors as lists, in order.
+    """
+    return _pool(name, workers).submit(encode, list(texts)).result()
+
+def shutdown():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
@@ -0,0 +1,122 @@
+"""
+Parallel PDF text extraction for read_file. A PDF is downloaded once to a
+temporary file and its pages are split into contiguous ranges, each extracted
+by a worker process that opens the file itself. Extracted pages are cached by
+blob name and generation, so a rewritten file is never served stale text.
+"""
+
+import os
+import tempfile
+import threading
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+import fitz
+
+from SlothAI.lib.cache import LRUCache
+from workers.pdf import extract_pages
+
+# fewer pages than this per worker are extracted in-process
+MIN_PAGES_PER_SHARD = 16
+
+# page texts keyed by (blob name, page index), versioned by blob generation.
+# (blob name, None) holds the page count. bounded by PAGE_CACHE_BYTES of text.
+PAGE_CACHE_BYTES = 64 * 1024 * 1024
+page_cache = LRUCache(maxsize=16384, maxbytes=PAGE_CACHE_BYTES)
+
+
+def page_shards(pages, shards, min_pages=MIN_PAGES_PER_SHARD):
+    """
+    Splits `pages` into at most `shards` contiguous runs of about equal size,
+    none shorter than `min_pages` unless there is only one.
+    """
+    if not pages:
+        return []
+    count = max(1, min(shards, len(pages) // min_pages))
+    size = -(-len(pages) // count)
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+# pools by number of workers
+_pools = {}
+_pools_lock = threading.Lock()
+
+def _pool(workers):
+    with _pools_lock:
+        if workers not in _pools:
+            # spawned, not forked, as the app process runs threads
+            _pools[workers] = ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return _pools[workers]
+
+def shutdown():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _pools.clear()
+
+
+def extract_texts(path, pages, workers=None):
+    """
+    Returns the texts of `pages` (0-based) of the PDF at `path`, in order.
+    Page ranges are extracted in parallel by up to `workers` processes.
+    """
+    workers = workers or os.cpu_count() or 1
+    shards = page_shards(pages, workers)
+    if len(shards) <= 1:
+        return extract_pages(path, pages)
+
+    texts = []
+    for shard_texts in _pool(workers).map(extract_pages, [path] * len(shards), shards):
+        texts.extend(shard_texts)
+    return texts
+
+
+def blob_pdf_texts(blob, page_number=None, workers=None, cache=True):
+    """
+    Returns the texts of every page of a PDF storage blob, or of the single
+    1-based `page_number`. Raises ValueError for a page number outside the
+    document.
+    """
+    version = blob.generation
+    num_pages = page_cache.get((blob.name, None), version) if cache else None
+
+    def index_pages(num_pages):
+        if page_number is None:
+            return list(range(num_pages))
+        if page_number < 1:
+            raise ValueError("Page numbers must be whole numbers > 0.")
+        if page_number > num_pages:
+            raise ValueError(f"Page number ({page_number}) is larger than the number of pages ({num_pages}).")
+        return [page_number - 1]
+
+    texts = {}
+    if num_pages is not None:
+        for page in index_pages(num_pages):
+            text = page_cache.get((blob.name, page), version)
+            if text is not None:
+                texts[page] = text
+
+        if len(texts) == len(index_pages(num_pages)):
+            return [texts[page] for page in sorted(texts)]
+
+    with tempfile.NamedTemporaryFile(suffix=".pdf") as pdf_file:
+        blob.download_to_file(pdf_file)
+        pdf_file.flush()
+
+        with fitz.open(pdf_file.name) as doc:
+            num_pages = len(doc)
+
+        pages = index_pages(num_pages)
+        missing = [page for page in pages if page not in texts]
+        texts.update(zip(missing, extract_texts(pdf_file.name, missing, workers)))
+
+    if cache:
+        page_cache.put((blob.name, None), num_pages, version)
+        for page in missing:
+            page_cache.put((blob.name, page), texts[page], version)
+
+    return [texts[page] for page in pages]
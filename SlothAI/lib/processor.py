@@ -1,5 +1,6 @@
 import ast
 import re
+import hashlib
 import math
 import time
 import base64
@@ -15,20 +16,28 @@ import openai
 import google.generativeai as genai
 
 from itertools import groupby
+from collections import ChainMap
 
 from google.cloud import vision, storage, documentai
 from google.api_core.client_options import ClientOptions
 
 from SlothAI.lib.util import random_string, random_name, get_file_extension, upload_to_storage, load_from_storage,upload_to_storage_requests, storage_pickle, cast_iching, split_image_by_height, download_as_bytes, local_callback_url
 from SlothAI.lib.template import Template
+from SlothAI.lib.cache import LRUCache
+from SlothAI.lib.csv_stream import CSV_READ_CHUNK_BYTES, csv_windows, csv_texts
+from SlothAI.lib.pdf_text import blob_pdf_texts
+from SlothAI.lib.embeddings import cached_embed_batches
+from SlothAI.lib.local_embeddings import LOCAL_MODEL_PREFIX, local_model_name, is_available, embed_local
+from SlothAI.lib.blobs import LazyDocument
 from SlothAI.web.models import Token
 
 from typing import Dict
 
 from flask import current_app as app
-from flask import url_for
+from flask import url_for, g
 
 from jinja2 import Environment, DictLoader
+from jinja2 import Template as JinjaTemplate
 
 from enum import Enum
 
@@ -49,20 +58,65 @@ from SlothAI.web.models import User, Node, Pipeline
 
 from SlothAI.lib.tasks import Task, process_data_dict_for_insert, auto_field_data, transform_data, get_values_by_json_paths, box_required, validate_dict_structure, TaskState, NonRetriableError, RetriableError, MissingInputFieldError, MissingOutputFieldError, UserNotFoundError, PipelineNotFoundError, NodeNotFoundError, TemplateNotFoundError
 
-from SlothAI.lib.database import table_exists, add_column, create_table, get_columns, featurebase_query
-from SlothAI.lib.database import weaviate_batch, weaviate_delete_collection, weaviate_hybrid_search, weaviate_similarity, extract_weaviate_params
+from SlothAI.lib.database import table_exists, add_column, create_table, get_columns, featurebase_query, featurebase_bulk_insert, cached_columns, remember_columns, forget_columns, is_retriable
+from SlothAI.lib.database import weaviate_batch, weaviate_delete_collection, weaviate_hybrid_search, weaviate_similarity, weaviate_search_batch, extract_weaviate_params
 
 from SlothAI.lib.util import strip_secure_fields, filter_document, random_string
 
 import SlothAI.lib.services as services
 
+class DocumentTemplate(JinjaTemplate):
+    """
+    Renders straight from a lazy document (or other non-dict mapping) instead of
+    copying it into a dict first, so only the fields the template uses get loaded.
+    """
+    def render(self, *args, **kwargs):
+        if len(args) == 1 and not kwargs and isinstance(args[0], (LazyDocument, ChainMap)):
+            context = self.new_context(ChainMap(args[0], self.globals), shared=True)
+            try:
+                return self.environment.concat(self.root_render_func(context))
+            except Exception:
+                self.environment.handle_exception()
+        return super().render(*args, **kwargs)
+
+
 env = Environment(trim_blocks=True, lstrip_blocks=True)
-env.globals['random_chars'] = random_chars
-env.globals['random_word'] = random_word
-env.globals['random_sentence'] = random_sentence
-env.globals['random_entry'] = random_entry
-env.globals['chunk_with_page_filename'] = chunk_with_page_filename
-env.filters['shuffle'] = filter_shuffle
+env.template_class = DocumentTemplate
+
+# environment for projecting a template's json block, as used by the jinja2 post-processor
+json_env = Environment(loader=DictLoader({
+    "base": """
+    {% block json %}
+    {% endblock %}
+    """
+}))
+json_env.template_class = DocumentTemplate
+
+for _env in (env, json_env):
+    _env.globals['random_chars'] = random_chars
+    _env.globals['random_word'] = random_word
+    _env.globals['random_sentence'] = random_sentence
+    _env.globals['random_entry'] = random_entry
+    _env.globals['chunk_with_page_filename'] = chunk_with_page_filename
+    _env.filters['shuffle'] = filter_shuffle
+
+# compiled templates, keyed by mode and a hash of the template text
+compiled_templates = LRUCache(maxsize=512)
+
+def compiled_template(template_text, mode="full"):
+    """
+    Returns the compiled jinja template for the text. The "full" mode renders the
+    whole text, the "json" mode renders only the text's json block.
+    """
+    key = (mode, hashlib.sha256(template_text.encode('utf-8')).hexdigest())
+    jinja_template = compiled_templates.get(key)
+    if jinja_template is None:
+        if mode == "json":
+            jinja_template = json_env.from_string("{% extends 'base' %}\n" + template_text)
+        else:
+            jinja_template = env.from_string(template_text)
+        compiled_templates.put(key, jinja_template)
+    return jinja_template
 
 from jinja2 import Undefined
 
@@ -83,6 +137,7 @@ def safe_tojson(value):
 
 
 env.filters['safe_tojson'] = safe_tojson
+json_env.filters['safe_tojson'] = safe_tojson
 
 class DocumentValidator(Enum):
     INPUT_FIELDS = 'input_fields'
@@ -146,6 +201,34 @@ def send_callback(task, node, error_message):
             app.logger.error(f"Error sending callback: {str(exception)}")
 
 
+class TaskContext:
+    """
+    Records resolved once per node execution by process() and shared with the
+    processors, so a step doesn't go back to the datastore for the same user,
+    pipeline, node or template.
+    """
+    def __init__(self, user, pipeline, node, template):
+        self.user = user
+        self.pipeline = pipeline
+        self.node = node
+        self.template = template
+
+
+def get_user(task):
+    context = g.get('task_context')
+    if context and context.user and context.user.get('uid') == task.user_id:
+        return context.user
+    return User.get_by_uid(uid=task.user_id)
+
+
+def get_template(node):
+    context = g.get('task_context')
+    if context and context.template and context.template.get('template_id') == node.get('template_id'):
+        return context.template
+    template_service = app.config['template_service']
+    return template_service.get_template(template_id=node.get('template_id'))
+
+
 # Main process entry
 def process(task: Task) -> Task:
     user = User.get_by_uid(task.user_id)
@@ -161,6 +244,10 @@ def process(task: Task) -> Task:
     if not node:
         raise NodeNotFoundError(node_id=node_id)
 
+    # resolve the records once for this node and share them with the processors
+    template = get_template(node)
+    g.task_context = TaskContext(user=user, pipeline=pipeline, node=node, template=template)
+
     missing_field = validate_document(node, task, DocumentValidator.INPUT_FIELDS)
     if missing_field:
         raise MissingInputFieldError(missing_field, node.get('name'))
@@ -196,9 +283,6 @@ def process(task: Task) -> Task:
     if extras:
         task.document.update(extras)
 
-    # get the user
-    user = User.get_by_uid(uid=task.user_id)
-
     # if "x-api-key" in node.get('extras'):
     task.document['X-API-KEY'] = user.get('db_token')
     # if "database_id" in node.get('extras'):
@@ -363,8 +447,7 @@ def process(task: Task) -> Task:
 # intelligent AI that can serve as a valuable companion and guide for personal growth and transformation.
 @processor
 def iching(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     # verify input fields steampunk style
     input_fields = template.get('input_fields')
@@ -390,8 +473,7 @@ def jinja2(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         task.document['current_epoch'] = current_epoch_time
 
         # load templates
-        template_service = app.config['template_service']
-        template = template_service.get_template(template_id=node.get('template_id'))
+        template = get_template(node)
 
         if not template:
             raise TemplateNotFoundError(template_id=node.get('template_id'))
@@ -403,30 +485,9 @@ def jinja2(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         if template_text:
             # Test if this is a post_processor run
             if is_post_processor:
-                # Define a fake template to project json into
-                templates = {
-                    "base": """
-                    {% block json %}
-                    {% endblock %}
-                    """
-                }
-
-                # child template gets the template_text from the node, extends base and is updated to templates
-                child = "{% extends 'base' %}\n" + template_text
-                templates.update({"child": child})
-
-                # set the environment and load custom functions
-                json_env = Environment(loader=DictLoader(templates))
-                json_env.globals['random_chars'] = random_chars
-                json_env.globals['random_word'] = random_word
-                json_env.globals['random_sentence'] = random_sentence
-                json_env.globals['random_entry'] = random_entry
-                json_env.globals['chunk_with_page_filename'] = chunk_with_page_filename
-                json_env.filters['shuffle'] = filter_shuffle
-
-                # Set new environment with the dictloader, grab the child template
+                # child template extends a fake base template to project the json block
                 try:
-                    child_template = json_env.get_template('child')
+                    child_template = compiled_template(template_text, mode="json")
                 except:
                     # template had issues TODO fix this
                     app.logger.debug("Passing on doing anything with Jinja2 due to not finding the child template from above?")
@@ -440,7 +501,7 @@ def jinja2(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
             else:
                 try:
                     # Render the entire template, as we are running the jinja2 processor
-                    jinja_template = env.from_string(template_text)
+                    jinja_template = compiled_template(template_text)
                     jinja_json = jinja_template.render(task.document)
                 except Exception as e:
                     # Get the line number of the error
@@ -474,8 +535,7 @@ def halt_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     task.document['current_epoch'] = current_epoch_time
 
     # Templates
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
@@ -485,7 +545,7 @@ def halt_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     # Render the template
     try:
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             rendered_text = jinja_template.render(task.document)
     except Exception as e:
         raise NonRetriableError(f"Unable to render jinja: {e}. You may want to use |safe_tojson to handle null entries and check your syntax.")
@@ -510,8 +570,7 @@ def jump_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     task.document['current_epoch'] = current_epoch_time
 
     # Templates
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
@@ -521,7 +580,7 @@ def jump_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     # Render the template
     try:
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             rendered_text = jinja_template.render(task.document)
     except Exception as e:
         raise NonRetriableError(f"Unable to render jinja: {e}. You may want to use |safe_tojson to handle null entries and check your syntax.")
@@ -558,12 +617,11 @@ def jump_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
 @processor
 def callback(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
     
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     if not user:
         raise UserNotFoundError(user_id=task.user_id)
 
@@ -629,11 +687,10 @@ def callback(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
 @processor
 def aigrub(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     # user
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
     username = user.get('name')
     user_token = user.get('api_token')
@@ -740,11 +797,10 @@ def aigrub(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 @processor
 def aiffmpeg(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     # Retrieve the template
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     # Get user information
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
     username = user.get('name')
     user_token = user.get('api_token')
@@ -801,7 +857,7 @@ def aiffmpeg(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         template_text = Template.remove_fields_and_extras(template.get('text'))
 
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -880,11 +936,10 @@ def aiffmpeg(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
 @processor
 def info_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     # user
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
 
     # can't do anything without this input
@@ -993,8 +1048,7 @@ def info_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
 @processor
 def split_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     input_fields = template.get('input_fields')
     output_fields = template.get('output_fields')
     if not input_fields:
@@ -1085,42 +1139,48 @@ def split_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
 
     new_task_count = math.ceil(total_sizes[0] / batch_size)
 
+    # number of child tasks created and queued together between split status checkpoints
+    checkpoint_size = int(node.get('extras', {}).get('split_checkpoint', 50))
+
+    # split fields are sliced by offset
+    offset = 0
+
     # split the data and re-task
     try:
-        for i in range(new_task_count):
+        for start in range(0, new_task_count, checkpoint_size):
 
             task_stored = task_service.fetch_tasks(task_id=task.id)[0] # not safe
 
             if not task_service.is_valid_state_for_process(task_stored['state']):
                 raise services.InvalidStateForProcess(task_stored['state'])
 
-            batch_data = {}
-            for field in outputs:
-                batch_data[field] = task.document[field][:batch_size]
-                del task.document[field][:batch_size]
-
-            new_task = Task(
-                id = random_string(),
-                user_id=task.user_id,
-                pipe_id=task.pipe_id,
-                nodes=task.nodes[1:],
-                document=batch_data,
-                created_at=datetime.datetime.utcnow(),
-                retries=0,
-                error=None,
-                state=TaskState.RUNNING,
-                split_status=-1,
-                jump_status=-1
-            )
-
-            # create new task and queue it      
-            task_service.create_task(new_task)
+            new_tasks = []
+            for i in range(start, min(start + checkpoint_size, new_task_count)):
+                batch_data = {field: task.document[field][offset:offset + batch_size] for field in outputs}
+                offset += batch_size
+
+                new_tasks.append(Task(
+                    id = random_string(),
+                    user_id=task.user_id,
+                    pipe_id=task.pipe_id,
+                    nodes=task.nodes[1:],
+                    document=batch_data,
+                    created_at=datetime.datetime.utcnow(),
+                    retries=0,
+                    error=None,
+                    state=TaskState.RUNNING,
+                    split_status=-1,
+                    jump_status=-1
+                ))
+
+            # create the new tasks and queue them
+            task_service.create_tasks_bulk(new_tasks)
 
             # commit status of split on original task
-            task.split_status = (i + 1) * batch_size
+            task.split_status = (start + len(new_tasks)) * batch_size
             task_service.update_task(task_id=task.id, split_status=task.split_status)
 
-            app.logger.info(f"Split Task: spawning task {i + 1} of projected {new_task_count}. It's ID is {new_task.id}")
+            app.logger.info(f"Split Task: spawned tasks {start + 1} to {start + len(new_tasks)} of projected {new_task_count}.")
 
     except services.InvalidStateForProcess as e:
         app.logger.warn(f"Task with ID {task.id} was being split. State was changed during that process.")
@@ -1130,6 +1190,10 @@ def split_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
         app.logger.warn(f"Task with ID {task.id} was being split. An exception was raised during that process.")
         raise NonRetriableError(e)
 
+    # everything was handed to the new tasks
+    for field in outputs:
+        task.document[field] = []
+
     # the initial task doesn't make it past split_task. so remove the rest of the nodes
     task.nodes = [task.next_node()]
     return task
@@ -1137,8 +1201,7 @@ def split_task(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
 
 @processor
 def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     extras = node.get('extras', None)
     if not extras:
@@ -1161,13 +1224,14 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     if len(output_fields) != len(input_fields):
         raise NonRetriableError("Input and output fields must be of the same length.")
 
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     if task.jump_status > -1:
         app.logger.info("returning task")
         task.jump_status = -1
         return task
 
-    if "instructor" in model:
+    # local models may have instructor in their name, but run here
+    if "instructor" in model and not model.startswith(LOCAL_MODEL_PREFIX):
         defer, selected_box = box_required(box_type="instructor")
         if defer:
             if selected_box:
@@ -1216,15 +1280,19 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
                 raise NonRetriableError(f"Unexpected status code from Instructor embedding endpoint: {response.status_code}.")
         except requests.RequestException as e:
             raise RetriableError(f"Failed to send data to Instructor box: {str(e)}")
-    return task
-        
-    # otherwise, use batches of strings to send to embeddings endpoints
+
+    # otherwise, send batches of strings to the embeddings endpoints. batches
+    # are packed up to the provider's limits, unless batch_size caps them
+    batch_size = None
     if task.document.get('batch_size'):
         batch_size = int(task.document.get('batch_size'))
         if batch_size < 1:
-            batch_size = 5
-    else:
-        batch_size = 5
+            batch_size = None
+
+    in_flight = app.config.get('EMBEDDING_IN_FLIGHT', {})
+
+    # vectors of texts embedded before are read from the cache, if there is one
+    embedding_cache = app.config.get('embedding_cache')
 
     # Loop through each input field and produce the proper output for each <key>_embedding output field
     for index, input_field in enumerate(input_fields):
@@ -1247,23 +1315,22 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
         if not isinstance(input_data, list):
             input_data = [input_data]
 
-        # Initialize a list to store the embeddings
-        embeddings = []
-
         if "voyage" in model:
             pass
             # add voyageai.com embeddings
 
         if model == "text-embedding-ada-002":
-            openai.api_key = task.document.get('openai_token')
-            try:
-                for i in range(0, len(input_data), batch_size):
-                    batch = input_data[i:i + batch_size]
-                    embedding_results = openai.embeddings.create(input=batch, model=task.document.get('model'))
-                    embeddings.extend([_object.embedding for _object in embedding_results.data])
+            client = openai.OpenAI(api_key=task.document.get('openai_token'))
+
+            def embed(batch):
+                embedding_results = client.embeddings.create(input=batch, model=model)
+                return [_object.embedding for _object in embedding_results.data]
 
+            try:
                 # Add the embeddings to the output field
-                task.document[output_field] = embeddings
+                task.document[output_field] = cached_embed_batches(embed, input_data, "openai", embedding_cache, model, None, batch_size=batch_size, in_flight=in_flight.get('openai', 8))
+            except RetriableError:
+                raise
             except Exception as ex:
                 app.logger.info(f"embedding processor: {ex}")
 
@@ -1280,18 +1347,40 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
                 raise NonRetriableError(f"The 'task_type' needs to be set to 'retrieval_query' or 'retrieval_document'.")
 
             genai.configure(api_key=task.document.get('gemini_token'))
-            try:
-                for i in range(0, len(input_data), batch_size):
-                    batch = input_data[i:i + batch_size]
-                    embedding_results = genai.embed_content(model=gemini_model, content=batch, task_type=task.document.get('task_type'))
-                    embeddings.extend([_object for _object in embedding_results['embedding']])
+            task_type = task.document.get('task_type')
+
+            def embed(batch):
+                embedding_results = genai.embed_content(model=gemini_model, content=batch, task_type=task_type)
+                return [_object for _object in embedding_results['embedding']]
 
+            try:
                 # Add the embeddings to the output field
-                task.document[output_field] = embeddings
+                task.document[output_field] = cached_embed_batches(embed, input_data, "gemini", embedding_cache, model, task_type, batch_size=batch_size, in_flight=in_flight.get('gemini', 4))
+            except RetriableError:
+                raise
             except Exception as ex:
                 app.logger.info(f"embedding processor: {ex}")
                 raise NonRetriableError(f"Exception talking to Gemini embedding: {ex}")
 
+        elif model.startswith(LOCAL_MODEL_PREFIX):
+            name = local_model_name(model)
+            if not is_available(name):
+                raise NonRetriableError(f"The {model} model needs the optional sentence-transformers install on the server (requirements-local.txt).")
+
+            workers = int(app.config.get('LOCAL_EMBEDDING_WORKERS', 1))
+
+            def embed(batch):
+                return embed_local(name, batch, workers=workers)
+
+            try:
+                # Add the embeddings to the output field
+                task.document[output_field] = cached_embed_batches(embed, input_data, "local", embedding_cache, model, None, batch_size=batch_size, in_flight=workers)
+            except RetriableError:
+                raise
+            except Exception as ex:
+                app.logger.info(f"embedding processor: {ex}")
+                raise NonRetriableError(f"Exception running local embedding model {name}: {ex}")
+
         elif "mistral-embed" in model:
             from mitta_mistralai.client import MistralClient
 
@@ -1300,17 +1389,18 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
             mistral = MistralClient(api_key=task.document.get('mistral_token'))
 
+            def embed(batch):
+                embedding_results = mistral.embeddings(
+                    model=model,
+                    input=batch,
+                )
+                return [_object.embedding for _object in embedding_results.data]
+
             try:
-                for i in range(0, len(input_data), batch_size):
-                    batch = input_data[i:i + batch_size]
-                    embedding_results = mistral.embeddings(
-                        model=model,
-                        input=batch,
-                    )
-                    embeddings.extend([_object.embedding for _object in embedding_results.data])
-                
                 # Add the embeddings to the output field
-                task.document[output_field] = embeddings
+                task.document[output_field] = cached_embed_batches(embed, input_data, "mistral", embedding_cache, model, None, batch_size=batch_size, in_flight=in_flight.get('mistral', 4))
+            except RetriableError:
+                raise
             except Exception as ex:
                 app.logger.info(f"embedding processor: {ex}")
                 raise NonRetriableError(f"Exception talking to Mistral embedding: {ex}")
@@ -1322,8 +1412,7 @@ def embedding(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 @processor
 def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     # output and input fields
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
@@ -1349,7 +1438,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         template_text = Template.remove_fields_and_extras(template.get('text'))
 
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1413,7 +1502,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         template_text = Template.remove_fields_and_extras(template.get('text'))
 
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1480,7 +1569,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
         template_text = Template.remove_fields_and_extras(template.get('text'))
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1556,7 +1645,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         # Process the template text
         template_text = Template.remove_fields_and_extras(template.get('text'))
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1627,7 +1716,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         # Process the template text
         template_text = Template.remove_fields_and_extras(template.get('text'))
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1696,7 +1785,7 @@ def aichat(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
         template_text = Template.remove_fields_and_extras(template.get('text'))
 
         if template_text:
-            jinja_template = env.from_string(template_text)
+            jinja_template = compiled_template(template_text)
             prompt = jinja_template.render(task.document)
         else:
             raise NonRetriableError("Couldn't find template text.")
@@ -1815,8 +1904,7 @@ def ai_prompt_to_dict(task=None, model="gpt-3.5-turbo-1106", prompt="", retries=
 @processor
 def aidict(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     # templates
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
     
@@ -1873,7 +1961,7 @@ def aidict(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
             template_text = Template.remove_fields_and_extras(template.get('text'))
 
             if template_text:
-                jinja_template = env.from_string(template_text)
+                jinja_template = compiled_template(template_text)
                 prompt = jinja_template.render(task.document)
             else:
                 raise NonRetriableError("Couldn't find template text.")
@@ -1935,8 +2023,7 @@ def aistruct(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     import instructor
     from datetime import datetime, date, time
 
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
@@ -2003,7 +2090,7 @@ def aistruct(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
                 # Construct the prompt
                 template_text = Template.remove_fields_and_extras(template.get('text'))
                 if template_text:
-                    jinja_template = env.from_string(template_text)
+                    jinja_template = compiled_template(template_text)
                     prompt = jinja_template.render(task.document)
                 else:
                     raise NonRetriableError("Couldn't find template text.")
@@ -2090,7 +2177,7 @@ def split_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
         raise NonRetriableError("The number of filenames and content_types must match.")
 
     # Get the uid
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
 
     # Get the offset and number of pages (default to all pages if not provided)
@@ -2175,14 +2262,13 @@ def split_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
 @processor
 def aivision(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     # Output and input fields
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
     # user
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
     username = user.get('name')
     user_token = user.get('api_token')
@@ -2553,12 +2639,11 @@ def aivision(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 @processor
 def aiimage(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     # Output and input fields
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
 
     output_fields = template.get('output_fields')   
@@ -2663,12 +2748,11 @@ def aiimage(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
 @processor
 def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
 
     output_fields = template.get('output_fields')   
@@ -2723,51 +2807,34 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
     if not task.document.get(output_field):
         task.document[output_field] = []
 
-    import fitz
+    # one storage client for all the files
+    gcs = storage.Client()
+    bucket = gcs.bucket(app.config['CLOUD_STORAGE_BUCKET'])
+
     # loop over the filenames
     for index, file_name in enumerate(filename):
         if "application/pdf" in content_type[index]:
-                # Get the document from Google Cloud Storage
-                gcs = storage.Client()
-                bucket = gcs.bucket(app.config['CLOUD_STORAGE_BUCKET'])
-                blob = bucket.blob(f"{uid}/{file_name}")
-                pdf_content = blob.download_as_bytes()
-
-                # Create a BytesIO object for the PDF content
-                pdf_content_stream = BytesIO(pdf_content)
-
-                # Open the PDF with fitz
-                doc = fitz.open(stream=pdf_content_stream, filetype="pdf")
-
-                num_pdf_pages = len(doc)
-
-                # Build a list of page numbers to process
-                index_pages = []
-                if page_numbers:
-                    if page_numbers[index] < 1:
-                        raise Exception("Page numbers must be whole numbers > 0.")
-                    if page_numbers[index] > num_pdf_pages:
-                        raise Exception(f"Page number ({page_numbers[index]}) is larger than the number of pages ({num_pdf_pages}).")
-                    index_pages.append(page_numbers[index]-1)
-                else:
-                    index_pages = list(range(num_pdf_pages))
+            blob = bucket.get_blob(f"{uid}/{file_name}")
+            if not blob:
+                raise NonRetriableError(f"Unable to find {file_name} in storage.")
 
-                texts = []
+            # pages are extracted in parallel and cached by the blob's generation
+            try:
+                texts = blob_pdf_texts(
+                    blob,
+                    page_number=page_numbers[index] if page_numbers else None,
+                    workers=app.config.get('PDF_TEXT_WORKERS') or None,
+                    cache=app.config.get('PDF_PAGE_CACHE', True)
+                )
+            except ValueError as ex:
+                raise NonRetriableError(str(ex))
 
-                # Extract text from specified pages
-                for page_num in index_pages:
-                    page = doc.load_page(page_num)
-                    text = page.get_text()
-                    texts.append(text)
-                # Assuming task.document[output_field] is a list where you want to store the extracted texts
-                task.document[output_field].extend(texts)
+            task.document[output_field].extend(texts)
+
+            # TODO ensure we extracted the texts and if we didn't, be sure that jump task processors can know this
 
-                # TODO ensure we extracted the texts and if we didn't, be sure that jump task processors can know this
-        
         elif "text/plain" in content_type[index]:
             # grab document
-            gcs = storage.Client()
-            bucket = gcs.bucket(app.config['CLOUD_STORAGE_BUCKET'])
             blob = bucket.blob(f"{uid}/{file_name}")
             text = blob.download_as_text()
 
@@ -2797,8 +2864,6 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
         elif "application/json" in content_type[index]:
             # grab JSON document as text
-            gcs = storage.Client()
-            bucket = gcs.bucket(app.config['CLOUD_STORAGE_BUCKET'])
             blob = bucket.blob(f"{uid}/{file_name}")
             texts = blob.download_as_text()
             try:
@@ -2818,7 +2883,6 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
             task.document[output_field].append("Data exported to 'json_data'")
 
         elif "text/csv" in content_type[index]:
-            import pandas as pd
             # check for prepend string
             if task.document.get('prepend_string'):
                 prepend_string = task.document.get('prepend_string')
@@ -2826,10 +2890,9 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
                 prepend_string = ""
 
             # Get the document
-            gcs = storage.Client()
-            bucket = gcs.bucket(app.config['CLOUD_STORAGE_BUCKET'])
-            blob = bucket.blob(f"{uid}/{file_name}")
-            file_content = blob.download_as_bytes()
+            blob = bucket.get_blob(f"{uid}/{file_name}")
+            if not blob:
+                raise NonRetriableError(f"Unable to find {file_name} in storage.")
 
             if task.document.get('split_num'):
                 split_num = int(task.document.get('split_num'))
@@ -2841,122 +2904,22 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
                 split_num = 0
                 split_start = 0
 
-            # put the max threshold in config at some point
-            if not split_num and len(file_content) > 800000:
-                task.document['max_split_size_limit'] = 800000
-                raise NonRetriableError("Maximum task size approached. You may want to use the 'split_num' and 'split_start' keys in the document to address this.")
+            max_size = app.config.get('CSV_STREAM_BYTES', 800000)
 
-            # Read the CSV content into DataFrame without headers initially
-            df = pd.read_csv(BytesIO(file_content), header=None)
+            # large files are streamed into child tasks of row windows
+            if not split_num and blob.size > max_size and len(filename) == 1:
+                return split_csv_file(node, task, blob, prepend_string, output_field)
 
-            # Find the first row with valid data to be used as headers
-            first_valid_header_index = df.apply(lambda row: row.notna().all(), axis=1).idxmax()
-            headers = df.iloc[first_valid_header_index]
-
-            # Check if the length of headers matches the number of columns
-            if len(headers) == df.shape[1]:
-                # Set the headers
-                df.columns = headers
-                # Drop the header row from the DataFrame
-                df = df.drop(first_valid_header_index)
-            else:
-                # Fallback to default naming if headers don't match
-                df.columns = ['column_' + str(i) for i in range(1, df.shape[1] + 1)]
-
-            # Replace spaces with underscores in column names and handle empty rows
-            df.columns = [prepend_string + col.replace(' ', '_') for col in df.columns]
-            df.dropna(how='all', inplace=True)
-            df = df.reset_index(drop=True)
-
-            # Process rows based on split_start and split_num
-            if split_start > 0:
-                df = df.iloc[split_start:]
-
-            if split_num > 0:
-                df = df.head(split_num)
-
-            # Replace NaN values with None
-            df = df.where(pd.notna(df), None)
-
-            # Drop rows where all elements are None
-            df.dropna(how='all', inplace=True)
-
-            # process empty items for string, int and floats - open a ticket for more types
-            data_dict = {}
-            texts = []
-
-            # patch all the None fields
-            for index, row in df.to_dict(orient='list').items():
-                row_data = []
-                row_type = None  # Reset row_type for each row 
-
-                # Determine the row_type by scanning the entire column if needed
-                for col_index, item in enumerate(row):
-                    if row_type is None and (pd.isna(item) or item is None):
-                        # Scan the entire column for a valid data type
-                        for col_item in df.iloc[:, col_index]:
-                            if not pd.isna(col_item) and col_item is not None:
-                                if isinstance(col_item, str):
-                                    row_type = 'string'
-                                elif isinstance(col_item, int):
-                                    row_type = 'int'
-                                elif isinstance(col_item, float):
-                                    row_type = 'float'
-                                break  # Break after finding the valid data type
-
-                row_index = 0
-                for col_index, item in enumerate(row):
-                    # limit to the split_num
-                    if row_index > split_num and split_num > 0:
-                        break
-
-                    # Determine the type based on the first non-null, non-NaN item
-                    if row_type is None and not pd.isna(item) and item is not None:
-                        if isinstance(item, str):
-                            row_type = 'string'
-                        elif isinstance(item, int):
-                            row_type = 'int'
-                        elif isinstance(item, float):
-                            row_type = 'float'
-
-                    if isinstance(item, str):
-                        try:
-                            converted_item = int(item)
-                            row_type = 'int'
-                        except ValueError:
-                            try:
-                                converted_item = float(item)
-                                row_type = 'float'
-                            except ValueError:
-                                converted_item = item
-                        row_data.append(converted_item)  
-                    elif pd.isna(item) or item is None:
-                        # Replace None based on the determined type
-                        if row_type == 'int':
-                            row_data.append(0)
-                        elif row_type == 'float':
-                            row_data.append(0.0)
-                        elif row_type == 'string':
-                            row_data.append("")
-                        else:
-                            row_data.append(None)
-                    else:
-                        row_data.append(item)
+            if not split_num and blob.size > max_size and not app.config.get('blob_store'):
+                task.document['max_split_size_limit'] = max_size
+                raise NonRetriableError("Maximum task size approached. You may want to use the 'split_num' and 'split_start' keys in the document to address this.")
 
-                    # add to the row index
-                    row_index = row_index + 1
+            # read the rows into typed columns
+            with blob.open("rb", chunk_size=CSV_READ_CHUNK_BYTES) as stream:
+                for _, columns in csv_windows(stream, prepend_string=prepend_string, start=split_start, count=split_num):
+                    task.document.update(columns)
+                    task.document[output_field].extend(csv_texts(columns))
 
-                # push the data into the return values
-                data_dict[index] = row_data
-                
-            # Add the values to the document
-            texts = []
-            for key, value in data_dict.items():
-                task.document[key] = value
-                texts.append(f"{key}:{','.join(map(str, value))}")
-            
-            # update document
-            task.document[output_field].extend(texts)
         else:
             raise NonRetriableError("Processor read_file supports text/plain, application/pdf, application/json, and text/csv content types only.")
 
@@ -2965,13 +2928,12 @@ def read_file(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
 @processor
 def read_uri(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
 
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
     
     # use the first output field TODO FIX THIS
@@ -3080,8 +3042,7 @@ def read_uri(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
 @processor
 def aispeech(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if not template:
         raise TemplateNotFoundError(template_id=node.get('template_id'))
@@ -3110,7 +3071,7 @@ def aispeech(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
             raise NonRetriableError(f"Input field '{field_name}' is not present in the document.")
     
     # user stuff, arguable we need it
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
 
     # grab the first input field name that isn't the filename
@@ -3155,7 +3116,7 @@ def aispeech(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
         try:
             if template_text:
-                jinja_template = env.from_string(template_text)
+                jinja_template = compiled_template(template_text)
                 item = jinja_template.render(task.document)
         except:
             pass
@@ -3210,8 +3171,7 @@ def aispeech(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 # audio input, text output
 @processor
 def aiaudio(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     # OpenAI only for now
     openai.api_key = task.document.get('openai_token')
@@ -3226,7 +3186,7 @@ def aiaudio(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
     except:
         output_field = "texts"
 
-    user = User.get_by_uid(uid=task.user_id)
+    user = get_user(task)
     uid = user.get('uid')
     
     filename = task.document.get('filename')
@@ -3372,11 +3332,10 @@ def aiaudio(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
 
 @processor
 def mod_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    user = User.get_by_uid(task.user_id)
+    user = get_user(task)
     
     # create template service
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if "weaviate" in task.document.get('model'):
         # Weaviate authentication
@@ -3407,11 +3366,10 @@ def mod_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Task
 
 @processor
 def read_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    user = User.get_by_uid(task.user_id)
+    user = get_user(task)
     
     # create template service
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if "weaviate" in task.document.get('model'):
         # let extract warn them about not having either
@@ -3422,67 +3380,60 @@ def read_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
             error_message = result["error"]
             raise NonRetriableError(error_message)
 
-        if "weaviate-similarity" in task.document.get('model'):
-            results = []
-            for i in range(len(weaviate_params["queries"])):
-                result = weaviate_similarity(
-                    weaviate_params["weaviate_collection"],
-                    weaviate_params["query_vectors"][i],
-                    limit=weaviate_params["limits"][i],
-                    offset=weaviate_params["offsets"][i],
-                    filters=weaviate_params["filters"][i],
-                    keyterms=weaviate_params["keyterms_list"][i],
-                    auth=weaviate_params["auth"]
-                )
-                results.append(result)
-
-            properties_lists = {}
-            for res in result:
-                if 'properties' in res:
-                    properties = res['properties']
-                    for key in properties.keys():
-                        if key not in properties_lists:
-                            properties_lists[key] = []
-                        properties_lists[key].append(properties[key])
-
-            for key, value in properties_lists.items():
-                if key not in task.document:
-                    task.document[key] = []
-                task.document[key].append(value)
+        model = task.document.get('model')
+        if "weaviate-similarity" in model or "weaviate-hybrid" in model:
+            # one search per query, or per query vector when there are no queries
+            count = len(weaviate_params["queries"]) or len(weaviate_params["query_vectors"])
+            query_vectors = weaviate_params["query_vectors"]
+
+            searches = []
+            for i in range(count):
+                search = {
+                    "weaviate_collection_name": weaviate_params["weaviate_collection"],
+                    "limit": weaviate_params["limits"][i],
+                    "offset": weaviate_params["offsets"][i],
+                    "filters": weaviate_params["filters"][i],
+                    "keyterms": weaviate_params["keyterms_list"][i],
+                    "auth": weaviate_params["auth"]
+                }
+                query_vector = query_vectors[i] if i < len(query_vectors) else None
+                if "weaviate-similarity" in model:
+                    search["query_vector"] = query_vector
+                else:
+                    search.update({
+                        "query": weaviate_params["queries"][i],
+                        "query_vector": query_vector,
+                        "alpha": weaviate_params["alphas"][i],
+                        "fusion_type": weaviate_params["fusion_types"][i]
+                    })
+                searches.append(search)
 
-            task.document['weaviate_results'] = results
-            return task
+            results = weaviate_search_batch(
+                weaviate_similarity if "weaviate-similarity" in model else weaviate_hybrid_search,
+                searches,
+                workers=int(app.config.get('WEAVIATE_SEARCH_WORKERS', 8))
+            )
 
-        if "weaviate-hybrid" in task.document.get('model'):
-            results = []
-            for i in range(len(weaviate_params["queries"])):
-                result = weaviate_hybrid_search(
-                    weaviate_params["weaviate_collection"],
-                    weaviate_params["queries"][i],
-                    query_vector=weaviate_params["query_vectors"][i],
-                    alpha=weaviate_params["alphas"][i],
-                    limit=weaviate_params["limits"][i],
-                    offset=weaviate_params["offsets"][i],
-                    fusion_type=weaviate_params["fusion_types"][i],
-                    filters=weaviate_params["filters"][i],
-                    keyterms=weaviate_params["keyterms_list"][i],
-                    auth=weaviate_params["auth"]
-                )
-                results.append(result)
-
-            properties_lists = {}
-            for res in result:
-                if 'properties' in res:
-                    properties = res['properties']
-                    for key in properties.keys():
-                        if key not in properties_lists:
-                            properties_lists[key] = []
-                        properties_lists[key].append(properties[key])
-
-            for key, value in properties_lists.items():
-                if key not in task.document:
-                    task.document[key] = []
-                task.document[key].append(value)
+            # each query's properties are appended to the document as one list,
+            # in query order
+            for result in results:
+                if isinstance(result, tuple):
+                    # weaviate_similarity returns (False, error) when it fails
+                    raise NonRetriableError(f"Weaviate search failed: {result[1].get('error')}")
+
+                properties_lists = {}
+                for res in result:
+                    if 'properties' in res:
+                        properties = res['properties']
+                        for key in properties.keys():
+                            if key not in properties_lists:
+                                properties_lists[key] = []
+                            properties_lists[key].append(properties[key])
+
+                for key, value in properties_lists.items():
+                    if key not in task.document:
+                        task.document[key] = []
+                    task.document[key].append(value)
 
             task.document['weaviate_results'] = results
             return task
@@ -3535,9 +3486,13 @@ def read_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Tas
                 # If "show tables" is found and it's not part of "show create table", block the query
                 raise NonRetriableError("SHOW TABLE functions are disabled for shared database access. Add a FeatureBase account to settings to enable advanced queries.")
 
+        # tables changed here are looked up again on their next write
+        for ddl_table in re.findall(r'\b(?:drop|alter)\s+table\s+(?:if\s+exists\s+)?(\w+)', doc['sql'], re.IGNORECASE):
+            forget_columns(ddl_table, doc)
+
         resp, err = featurebase_query(document=doc)
         if err:
-            if "exception" in err:
+            if is_retriable(err):
                 raise RetriableError(err)
             else:
                 # if dropping and doesn't exist
@@ -3574,11 +3529,10 @@ from SlothAI.lib.schemar import Schemar
 
 @processor
 def write_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Task:
-    user = User.get_by_uid(task.user_id)
+    user = get_user(task)
     
     # create template service
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
 
     if task.document.get('model') == "weaviate":
         weaviate_url = task.document.get('weaviate_url')
@@ -3647,31 +3601,10 @@ def write_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Ta
             keys = [n['name'] for n in _keys]
             data = get_values_by_json_paths(keys, task.document)
 
-        # check table
-        tbl_exists, err = table_exists(table, auth)
-        if err:
-            raise NonRetriableError("Can't connect to database. Check your FeatureBase connection.")
-        
-        # if it doesn't exists, create it
-        if not tbl_exists:
-            create_schema = Schemar(data=data).infer_create_table_schema() # check data.. must be lists
-            err = create_table(table, create_schema, auth)
-            if err:
-                if "already exists" in err:
-                    # between checking if the table existed and trying to create the
-                    # table, the table was created.
-                    pass
-                elif "exception" in err:
-                    # issue connecting to FeatureBase cloud
-                    raise RetriableError(err)
-                else:
-                    # good response from the server but there was a query error.
-                    raise NonRetriableError(f"FeatureBase returned: {err}. Check your fields are valid with a callback.")
-                
-        # get columns from the table
-        column_type_map, task.document['error'] = get_columns(table, auth)
-        if task.document.get("error", None):
-            raise Exception("unable to get columns from table in FeatureBase cloud")
+        # the table's columns are cached after the first write
+        column_type_map = cached_columns(table, auth)
+        if column_type_map is None:
+            column_type_map = featurebase_table_columns(table, data, auth, task)
 
         columns = [k for k in column_type_map.keys()]
 
@@ -3683,26 +3616,46 @@ def write_store(node: Dict[str, any], task: Task, is_post_processor=False) -> Ta
 
                 err = add_column(table, {'name': key, 'type': task.document["schema"][key]}, auth)
                 if err:
-                    if "exception" in err:
+                    if "already exists" in err:
+                        # added by another write since the columns were cached
+                        pass
+                    elif is_retriable(err):
                         raise RetriableError(err)
                     else:
                         # good response from the server but query error
+                        forget_columns(table, auth)
                         raise NonRetriableError(err)
 
                 column_type_map[key] = task.document["schema"][key]
+                remember_columns(table, auth, column_type_map)
 
         columns, records = process_data_dict_for_insert(data, column_type_map, table)
 
-        sql = f"INSERT INTO {table} ({','.join(columns)}) VALUES {','.join(records)};"
+        # record ranges a previous attempt of this task already inserted
+        written = task.document.get('write_store_written', [])
 
-        _, err = featurebase_query({"sql": sql, "dbid": auth.get('dbid'), "db_token": auth.get('db_token')})
-        if err:
-            if "exception" in err:
-                raise RetriableError(err)
+        stats, errs = featurebase_bulk_insert(
+            table, columns, records, auth,
+            max_bytes=int(app.config.get('FEATUREBASE_INSERT_BYTES', 1000000)),
+            workers=int(app.config.get('FEATUREBASE_INSERT_WORKERS', 8)),
+            attempts=int(app.config.get('FEATUREBASE_INSERT_ATTEMPTS', 3)),
+            written=written
+        )
+
+        app.logger.info(f"write_store: task {task.id} inserted {sum(stat['stop'] - stat['start'] for stat in stats if not stat['error'])} of {len(records)} records into {table} in {len(stats)} statements.")
+
+        if errs:
+            # keep what was inserted so a retry only sends the rest
+            task.document['write_store_written'] = written + [[stat['start'], stat['stop']] for stat in stats if not stat['error']]
+            if any(is_retriable(err) for err in errs):
+                raise RetriableError(errs[0])
             else:
-                # good response from the server but query error
-                raise NonRetriableError(err)
-        
+                # good response from the server but query error, possibly
+                # against columns that changed since they were cached
+                forget_columns(table, auth)
+                raise NonRetriableError(errs[0])
+
+        task.document.pop('write_store_written', None)
         return task
 
 # alias old name
@@ -3711,6 +3664,124 @@ write_fb = write_store
 
 # helper functions
 # ================
+def featurebase_table_columns(table, data, auth, task):
+    """
+    Returns the column type map of a FeatureBase table, creating the table from
+    the data if it doesn't exist, and caches it.
+    """
+    # check table
+    tbl_exists, err = table_exists(table, auth)
+    if err:
+        raise NonRetriableError("Can't connect to database. Check your FeatureBase connection.")
+
+    # if it doesn't exists, create it
+    if not tbl_exists:
+        create_schema = Schemar(data=data).infer_create_table_schema() # check data.. must be lists
+        err = create_table(table, create_schema, auth)
+        if not err:
+            # the table has exactly the inferred columns
+            column_type_map = {"_id": "id", **Schemar(data=data).infer_schema()}
+            remember_columns(table, auth, column_type_map)
+            return column_type_map
+
+        if "already exists" in err:
+            # between checking if the table existed and trying to create the
+            # table, the table was created.
+            pass
+        elif is_retriable(err):
+            # issue connecting to FeatureBase cloud
+            raise RetriableError(err)
+        else:
+            # good response from the server but there was a query error.
+            raise NonRetriableError(f"FeatureBase returned: {err}. Check your fields are valid with a callback.")
+
+    # get columns from the table
+    column_type_map, task.document['error'] = get_columns(table, auth)
+    if task.document.get("error", None):
+        raise Exception("unable to get columns from table in FeatureBase cloud")
+
+    remember_columns(table, auth, column_type_map)
+    return column_type_map
+
+
+def split_csv_file(node, task, blob, prepend_string, output_field):
+    """
+    Streams a CSV blob into child tasks of `csv_window_rows` rows each, the
+    way split_task does, committing split_status at every checkpoint so a
+    retried task resumes after the rows it already handed out.
+    """
+    task_service = app.config['task_service']
+
+    try:
+        window_rows = int(task.document.get('csv_window_rows', 1000))
+        checkpoint_size = int(node.get('extras', {}).get('split_checkpoint', 50))
+    except (TypeError, ValueError):
+        raise NonRetriableError("read_file processor: csv_window_rows and split_checkpoint must be integers")
+
+    try:
+        task_stored = task_service.fetch_tasks(task_id=task.id)[0]
+        task.split_status = task_stored['split_status']
+    except Exception as e:
+        raise NonRetriableError(f"getting task by ID but got none: {e}")
+
+    # rows handed to child tasks by an earlier attempt
+    start = max(task.split_status, 0)
+
+    # fields the child tasks get from the parent
+    document = {key: value for key, value in task.document.items() if key != output_field}
+
+    def create_tasks(new_tasks, rows):
+        task_stored = task_service.fetch_tasks(task_id=task.id)[0] # not safe
+        if not task_service.is_valid_state_for_process(task_stored['state']):
+            raise services.InvalidStateForProcess(task_stored['state'])
+
+        task_service.create_tasks_bulk(new_tasks)
+
+        # commit status of split on original task
+        task.split_status = rows
+        task_service.update_task(task_id=task.id, split_status=task.split_status)
+        app.logger.info(f"Read File: Task ID: {task.id}. Spawned tasks for rows up to {rows}.")
+
+    try:
+        new_tasks = []
+        rows = start
+        with blob.open("rb", chunk_size=CSV_READ_CHUNK_BYTES) as stream:
+            for offset, columns in csv_windows(stream, window_rows, prepend_string, start=start):
+                new_tasks.append(Task(
+                    id=random_string(),
+                    user_id=task.user_id,
+                    pipe_id=task.pipe_id,
+                    nodes=task.nodes[1:],
+                    document={**document, **columns, output_field: csv_texts(columns)},
+                    created_at=datetime.datetime.utcnow(),
+                    retries=0,
+                    error=None,
+                    state=TaskState.RUNNING,
+                    split_status=-1,
+                    jump_status=-1
+                ))
+                rows = offset + len(next(iter(columns.values())))
+
+                if len(new_tasks) >= checkpoint_size:
+                    create_tasks(new_tasks, rows)
+                    new_tasks = []
+
+        if new_tasks:
+            create_tasks(new_tasks, rows)
+
+    except services.InvalidStateForProcess as e:
+        app.logger.warn(f"Task with ID {task.id} was reading a CSV file. State was changed during that process.")
+        raise e
+
+    except Exception as e:
+        app.logger.warn(f"Task with ID {task.id} was reading a CSV file. An exception was raised during that process.")
+        raise NonRetriableError(e)
+
+    # the rows went to the new tasks, so the initial task stops here
+    task.nodes = [task.next_node()]
+    return task
+
+
 def process_input_fields(task_document, input_fields):
     updated_document = task_document
     
@@ -3732,8 +3803,7 @@ def encode_image(image_file):
 
 
 def validate_document(node, task: Task, validate: DocumentValidator):
-    template_service = app.config['template_service']
-    template = template_service.get_template(template_id=node.get('template_id'))
+    template = get_template(node)
     fields = template.get(validate)
     if fields:
         missing_key = validate_dict_structure(template.get('input_fields'), task.document)
@@ -3747,27 +3817,29 @@ def evaluate_extras(node, task) -> Dict[str, any]:
     # get the node's current extras, which may be templated
     extras = node.get('extras', {})
 
-    # combine with document (extras in node will overwrite entries in document)
-    combined_dict = task.document.copy()
-    combined_dict.update(extras)
+    user = get_user(task)
 
-    # we used to do it the other way around
-    # combined_dict = extras.copy()
-    # combined_dict.update(task.document)
+    # templated extras may reference the document, other extras and the username
+    # (extras in node will overwrite entries in document)
+    context = ChainMap({'username': user.get('name')}, extras, task.document)
 
-    user = User.get_by_uid(task.user_id)
-    combined_dict['username'] = user.get('name')
+    # only the extras are rendered, so the cost doesn't depend on the document size
+    extras_eval = {key: render_extra(value, context) for key, value in extras.items()}
+    extras_eval['username'] = context['username']
 
-    # eval the extras from inputs_fields first
-    extras_template = env.from_string(str(combined_dict))
-    extras_from_template = extras_template.render(combined_dict)
-    extras_eval = ast.literal_eval(extras_from_template)
+    return extras_eval
 
-    # remove the keys that were in the document
-    # extras_eval = {key: value for key, value in extras_eval.items() if key not in task.document}
-    # instead, leave the keys
 
-    return extras_eval
+def render_extra(value, context):
+    if isinstance(value, str):
+        if '{{' in value or '{%' in value:
+            return compiled_template(value).render(context)
+        return value
+    elif isinstance(value, dict):
+        return {key: render_extra(item, context) for key, item in value.items()}
+    elif isinstance(value, list):
+        return [render_extra(item, context) for item in value]
+    return value
 
 
 def add_index_to_filename(filename, index):
@@ -1,33 +1,73 @@
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, List
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app as app 
 
 from google.cloud import tasks_v2
 from google.protobuf import timestamp_pb2
-from SlothAI.lib.tasks import Task
+from SlothAI.lib.tasks import Task, RetriableError
+from SlothAI.lib.blobs import spill_document
 from datetime import datetime, timedelta
 
+import copy
+import queue
 import random
+import threading
 import os
 
+class QueueFullError(RetriableError):
+	def __init__(self, capacity):
+		super().__init__(f"Task queue is full: {capacity} tasks are already waiting.")
+
 class AbstractTaskQueue(ABC):
 	@abstractmethod
 	def queue(self, task: Task):
 		pass
 
-class AppEngineTaskQueue(ABC):
+	def queue_multi(self, tasks: List[Task]):
+		for task in tasks:
+			self.queue(task)
+
+class AppEngineTaskQueue(AbstractTaskQueue):
 
 	def queue(self, task: Task):
-		project_id = app.config['PROJECT_ID']
 		client = tasks_v2.CloudTasksClient()
-		queue = client.queue_path(project_id, app.config['SLOTH_QUEUE_REGION'], app.config['SLOTH_QUEUE'])
-		encoding = task.to_json().encode()
+		client.create_task(parent=self._queue_path(client), task=self._build_task(task))
+
+	def queue_multi(self, tasks: List[Task]):
+		# one client is shared by the submitting threads. requests are built
+		# here, as the threads don't have the app context
+		client = tasks_v2.CloudTasksClient()
+		parent = self._queue_path(client)
+		cloud_tasks = [self._build_task(task) for task in tasks]
+
+		with ThreadPoolExecutor(max_workers=app.config.get('TASK_QUEUE_WORKERS', 16)) as executor:
+			futures = [executor.submit(client.create_task, parent=parent, task=request) for request in cloud_tasks]
+			for future in futures:
+				future.result()
+
+	def _queue_path(self, client):
+		return client.queue_path(app.config['PROJECT_ID'], app.config['SLOTH_QUEUE_REGION'], app.config['SLOTH_QUEUE'])
+
+	def _build_task(self, task: Task):
+		# large document fields travel through the blob store, if there is one
+		blob_store = app.config.get('blob_store')
+		document = None
+		if blob_store:
+			document = spill_document(task.document, blob_store, app.config.get('TASK_BLOB_THRESHOLD', 65536))
+
+		wire_format = app.config.get('TASK_WIRE_FORMAT', "json")
+		encoding = task.to_wire(wire_format, document=document)
+		headers = {
+			"Content-type": "application/json" if wire_format == "json" else "application/octet-stream",
+			"X-Task-Encoding": wire_format
+		}
 
 		if app.config['DEV'] == "True":
 			app_engine_task = {
 				"http_request": {
 					"url": f"{app.config['NGROK_URL']}/tasks/process/{app.config['CRON_KEY']}",
-					"headers": {"Content-type": "application/json"},
+					"headers": headers,
 					"http_method": tasks_v2.HttpMethod.POST
 				}
 			}
@@ -38,7 +78,7 @@ class AppEngineTaskQueue(ABC):
 					"http_method": tasks_v2.HttpMethod.POST,
 					"app_engine_routing": {"version": os.environ['GAE_VERSION']},
 					"relative_uri": f"/tasks/process/{app.config['CRON_KEY']}",
-					"headers": {"Content-type": "application/json"}
+					"headers": headers
 				}
 			}
 			app_engine_task["app_engine_http_request"]["body"] = encoding
@@ -64,7 +104,61 @@ class AppEngineTaskQueue(ABC):
 
 		app_engine_task["schedule_time"] = timestamp
 
-		# Send the task to the Cloud Tasks queue
-		response = client.create_task(parent=queue, task=app_engine_task)
+		return app_engine_task
+
+
+class LocalTaskQueue(AbstractTaskQueue):
+	"""
+	In-process task queue. A pool of worker threads runs each task through
+	`handler`, the same logic the /tasks/process endpoint uses, inside an app
+	context. Retries are delayed 20 seconds per retry like AppEngineTaskQueue.
+
+	At most `capacity` tasks wait to be picked up. Callers outside the pool block
+	for up to `timeout` seconds for room and then get a QueueFullError. Workers
+	never block, so a task moving on to its next node can't deadlock the pool.
+	"""
+	def __init__(self, app, handler, workers=4, capacity=1000, timeout=30):
+		self.app = app
+		self.handler = handler
+		self.capacity = capacity
+		self.timeout = timeout
+
+		self._pending = queue.Queue()
+		self._slots = threading.BoundedSemaphore(capacity)
+		self._local = threading.local()
+
+		for i in range(workers):
+			worker = threading.Thread(target=self._work, name=f"sloth-worker-{i}", daemon=True)
+			worker.start()
+
+	def queue(self, task: Task):
+		# workers may run over capacity, anyone else waits for a free slot
+		if getattr(self._local, 'is_worker', False):
+			has_slot = self._slots.acquire(blocking=False)
+		else:
+			has_slot = self._slots.acquire(timeout=self.timeout)
+			if not has_slot:
+				raise QueueFullError(self.capacity)
+
+		# the caller keeps using its task object after queueing it
+		item = (copy.deepcopy(task), has_slot)
+
+		if task.retries:
+			timer = threading.Timer(20 * task.retries, self._pending.put, args=(item,))
+			timer.daemon = True
+			timer.start()
+		else:
+			self._pending.put(item)
+
+	def _work(self):
+		self._local.is_worker = True
+		while True:
+			task, has_slot = self._pending.get()
+			if has_slot:
+				self._slots.release()
 
-		# self.id = response.name.split('/')[-1]
\ No newline at end of file
+			try:
+				with self.app.app_context():
+					self.handler(task)
+			except Exception as ex:
+				self.app.logger.error(f"Local task queue failed running task with id {task.id}: {ex}")
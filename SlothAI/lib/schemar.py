@@ -114,48 +114,59 @@ class Schemar:
 
 
 
-def string_to_datetime(string):
-    
-    # input must be a string
+DATETIME_FORMATS = [
+    "%Y",
+    "%Y-%m",
+    "%Y-%m-%d",
+    "%Y-%m-%d %H",
+    "%Y-%m-%dT%H",
+    "%Y-%m-%d %H%z",
+    "%Y-%m-%dT%H%z",
+    "%Y-%m-%d %H:%M",
+    "%Y-%m-%dT%H:%M",
+    "%Y-%m-%d %H:%M%z",
+    "%Y-%m-%dT%H:%M%z",
+    "%Y-%m-%d %H:%M:%S",
+    "%Y-%m-%dT%H:%M:%S",
+    "%Y-%m-%d %H:%M:%S%z",
+    "%Y-%m-%dT%H:%M:%S%z",
+    "%Y-%m-%d %H:%M:%S.%f",
+    "%Y-%m-%dT%H:%M:%S.%f",
+    "%Y-%m-%d %H:%M:%S.%f%z",
+    "%Y-%m-%dT%H:%M:%S.%f%z",
+    "%m/%d/%Y",
+    "%m/%d/%Y %I:%M:%S %p",
+    "%m/%d/%Y %I:%M:%S %p %Z",
+    "%B %d %Y",
+    "%B %d, %Y"
+]
+
+def detect_datetime_format(string):
+    # returns the first format in DATETIME_FORMATS that parses the string
     if not isinstance(string, str):
         return None
 
-    formats = [
-        "%Y",
-        "%Y-%m",
-        "%Y-%m-%d",
-        "%Y-%m-%d %H",
-        "%Y-%m-%dT%H",
-        "%Y-%m-%d %H%z",
-        "%Y-%m-%dT%H%z",
-        "%Y-%m-%d %H:%M",
-        "%Y-%m-%dT%H:%M",
-        "%Y-%m-%d %H:%M%z",
-        "%Y-%m-%dT%H:%M%z",
-        "%Y-%m-%d %H:%M:%S",
-        "%Y-%m-%dT%H:%M:%S",
-        "%Y-%m-%d %H:%M:%S%z",
-        "%Y-%m-%dT%H:%M:%S%z",
-        "%Y-%m-%d %H:%M:%S.%f",
-        "%Y-%m-%dT%H:%M:%S.%f",
-        "%Y-%m-%d %H:%M:%S.%f%z",
-        "%Y-%m-%dT%H:%M:%S.%f%z",
-        "%m/%d/%Y",
-        "%m/%d/%Y %I:%M:%S %p",
-        "%m/%d/%Y %I:%M:%S %p %Z",
-        "%B %d %Y",
-        "%B %d, %Y"
-    ]
-
-    for format in formats:
+    for format in DATETIME_FORMATS:
         try:
-            date_object = datetime.strptime(string, format)
-            return date_object
+            datetime.strptime(string, format)
+            return format
         except Exception:
             continue
 
     return None
 
+def string_to_datetime(string):
+    
+    # input must be a string
+    if not isinstance(string, str):
+        return None
+
+    format = detect_datetime_format(string)
+    if format is None:
+        return None
+
+    return datetime.strptime(string, format)
+
 def datetime_to_string(dt):
 
     # input must be datetime
@@ -38,6 +38,26 @@ class TaskService:
         )
         self.queue_task(task)
 
+    def create_tasks_bulk(self, tasks: List[Task]):
+        # new tasks go in with one store write and are queued concurrently. the
+        # stored state already matches what queue_task would write back.
+        self.task_store.create_multi([
+            {
+                "task_id": task.id,
+                "user_id": task.user_id,
+                "current_node_id": task.next_node(),
+                "pipe_id": task.pipe_id,
+                "created_at": task.created_at,
+                "state": task.state,
+                "error": task.error,
+                "retries": task.retries,
+                "split_status": task.split_status,
+                "jump_status": task.jump_status
+            }
+            for task in tasks
+        ])
+        self.task_queue.queue_multi(tasks)
+
     def update_task(self, task_id, **kwargs):
         self.task_store.update(task_id, **kwargs)
 
@@ -1,8 +1,12 @@
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, List
 import datetime
+import sqlite3
+import threading
+from contextlib import contextmanager
 
 from SlothAI.lib.util import random_string, compress_text, decompress_text
+from SlothAI.web.models import DefinitionVersion, cached_definition, ndb_context_manager
 
 from google.cloud import ndb
 
@@ -11,6 +15,10 @@ class AbstractTaskStore(ABC):
 	def create(cls, task_id, user_id, current_node_id, pipe_id, created_at, state, error, retries, split_status, jump_status):
 		pass
 
+	@abstractmethod
+	def create_multi(cls, tasks: List[Dict[str, any]]):
+		pass
+
 	@abstractmethod
 	def update(cls, task_id: str, **kwargs: Dict[str, any]):
 		pass
@@ -27,14 +35,6 @@ class AbstractTaskStore(ABC):
 	def delete(cls, task_id=None, user_id=None, states=None):
 		pass
 
-# Create a context manager decorator for NDBTaskStore
-def ndb_context_manager(func):
-    def wrapper(*args, **kwargs):
-        with ndb.Client().context():
-            result = func(*args, **kwargs)
-        return result  # Return the result outside the context
-    return wrapper
-
 class NDBTaskStore(ndb.Model):
     task_id = ndb.StringProperty()
     user_id = ndb.StringProperty()
@@ -55,6 +55,7 @@ class NDBTaskStore(ndb.Model):
     @ndb_context_manager
     def create(cls, task_id, user_id, current_node_id, pipe_id, created_at, state, error, retries, split_status, jump_status):
         task = cls(
+            id=task_id,
             task_id=task_id,
             user_id=user_id,
             current_node_id=current_node_id,
@@ -69,23 +70,109 @@ class NDBTaskStore(ndb.Model):
         task.put()
         return task.to_dict()
 
+    @classmethod
+    @ndb_context_manager
+    def create_multi(cls, tasks):
+        entities = [
+            cls(
+                id=task['task_id'],
+                task_id=task['task_id'],
+                user_id=task['user_id'],
+                current_node_id=task['current_node_id'],
+                pipe_id=task['pipe_id'],
+                created_at=task['created_at'],
+                state=task['state'].value,
+                error=task['error'],
+                retries=task['retries'],
+                split_status=task['split_status'],
+                jump_status=task['jump_status']
+            )
+            for task in tasks
+        ]
+        ndb.put_multi(entities)
+        return [entity.to_dict() for entity in entities]
+
     @classmethod
     @ndb_context_manager
     def delete_older_than(cls, hours=0, minutes=0, seconds=0):
         threshold = datetime.datetime.utcnow() - \
             datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds)
-        entities = cls.query(cls.created_at < threshold).fetch()
-        if entities:
-            for entity in entities:
-                entity.key.delete()
+        keys = cls.query(cls.created_at < threshold).fetch(keys_only=True)
+        if keys:
+            ndb.delete_multi(keys)
+
+    @classmethod
+    def _get_by_task_id(cls, task_id):
+        return cls._get_by_task_ids([task_id])[0]
+
+    @classmethod
+    def _get_by_task_ids(cls, task_ids):
+        # tasks are keyed by their task_id, and are read in one get_multi.
+        # tasks written before that get moved over to a keyed entity the
+        # first time they are looked up.
+        tasks = ndb.get_multi([ndb.Key(cls, task_id) for task_id in task_ids])
+
+        missing = [task_id for task_id, task in zip(task_ids, tasks) if task is None]
+        if missing:
+            legacy = {}
+            # IN queries take at most 30 values
+            for i in range(0, len(missing), 30):
+                for entity in cls.query(cls.task_id.IN(missing[i:i + 30])).fetch():
+                    legacy[entity.task_id] = cls._rekey(entity)
+            tasks = [task or legacy.get(task_id) for task_id, task in zip(task_ids, tasks)]
+
+        return tasks
+
+    @classmethod
+    def _rekey(cls, legacy):
+        task = cls(id=legacy.task_id, **legacy.to_dict())
+        task.put()
+        legacy.key.delete()
+        return task
+
+    @classmethod
+    @ndb_context_manager
+    def migrate_keys(cls, batch_size=500, max_batches=20, cursor=None):
+        """
+        Moves tasks not yet keyed by their task_id over to keyed entities, a
+        page of `batch_size` at a time, and returns (migrated, cursor, done).
+        Legacy tasks have Datastore assigned integer ids, which sort before
+        the task_id names, so the scan ends at the first keyed task. Legacy
+        tasks without a task_id can never be looked up and are deleted. Pass
+        the returned urlsafe cursor back in to resume where the call stopped.
+        """
+        migrated = 0
+        cursor = ndb.Cursor(urlsafe=cursor) if cursor else None
+        for _ in range(max_batches):
+            page, cursor, more = cls.query().order(cls._key).fetch_page(batch_size, start_cursor=cursor)
+
+            legacy = [entity for entity in page if not isinstance(entity.key.id(), str)]
+            keyed = [entity for entity in legacy if entity.task_id]
+            if keyed:
+                ndb.put_multi([cls(id=entity.task_id, **entity.to_dict()) for entity in keyed])
+                migrated += len(keyed)
+            if legacy:
+                ndb.delete_multi([entity.key for entity in legacy])
+
+            if not more or len(legacy) < len(page):
+                return migrated, None, True
+
+        return migrated, cursor.urlsafe().decode('ascii'), False
 
     @classmethod
     @ndb_context_manager
     def fetch(cls, **kwargs):
+        # task_id, or a list of task_ids, are read by key
+        task_ids = [kwargs['task_id']] if 'task_id' in kwargs else kwargs.get('task_ids')
+        if task_ids is not None:
+            tasks = cls._get_by_task_ids(list(task_ids)) if task_ids else []
+            return [
+                task.to_dict() for task in tasks
+                if task and all(getattr(task, key) == kwargs[key] for key in ['user_id', 'pipe_id', 'current_node_id'] if key in kwargs)
+            ]
+
         query_conditions = []
 
-        if 'task_id' in kwargs:
-            query_conditions.append(cls.task_id == kwargs['task_id'])
         if 'user_id' in kwargs:
             query_conditions.append(cls.user_id == kwargs['user_id'])
         if 'pipe_id' in kwargs:
@@ -104,7 +191,7 @@ class NDBTaskStore(ndb.Model):
     @classmethod
     @ndb_context_manager
     def update(cls, task_id, **kwargs):
-        task = cls.query(cls.task_id == task_id).get()
+        task = cls._get_by_task_id(task_id)
         if not task:
             raise Exception("task_id not found")
 
@@ -118,7 +205,7 @@ class NDBTaskStore(ndb.Model):
             task.retries = kwargs['retries']
         if 'split_status' in kwargs:
             task.split_status = kwargs['split_status']
-        if 'jump_status in kwargs' in kwargs:
+        if 'jump_status' in kwargs:
             task.jump_status= kwargs['jump_status']
 
         task.put()
@@ -130,13 +217,16 @@ class NDBTaskStore(ndb.Model):
     def delete(cls, task_id=None, user_id=None, states=None):
         query_conditions = []
 
+        if task_id:
+            task = cls._get_by_task_id(task_id)
+            if task and (not user_id or task.user_id == user_id):
+                task.key.delete()
+            return True
+
         if user_id:
             query_conditions.append(cls.user_id == user_id)
 
-        if task_id:
-            # If task_id is provided, we use it in the query conditions.
-            query_conditions.append(cls.task_id == task_id)
-        elif states:
+        if states:
             # If states are provided but no task_id, then we prepare a compound 'OR' condition for all the states.
             # This is assuming that the combination of user_id and each of the states is desired.
             state_conditions = [cls.state == state for state in states]
@@ -166,6 +256,168 @@ class NDBTaskStore(ndb.Model):
 
         return True
     
+class SQLiteTaskStore(AbstractTaskStore):
+    """
+    Task store backed by a local SQLite database in WAL mode, for self-hosted
+    installs and load tests. Each thread gets its own connection.
+    """
+    columns = ['task_id', 'user_id', 'current_node_id', 'pipe_id', 'created_at', 'state', 'error', 'retries', 'split_status', 'jump_status']
+
+    def __init__(self, path="tasks.db"):
+        self.path = path
+        self._local = threading.local()
+
+        conn = self._conn()
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                task_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                current_node_id TEXT,
+                pipe_id TEXT,
+                created_at TEXT,
+                state TEXT,
+                error TEXT,
+                retries INTEGER,
+                split_status INTEGER,
+                jump_status INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS tasks_user_id_state ON tasks (user_id, state);
+            CREATE INDEX IF NOT EXISTS tasks_created_at ON tasks (created_at);
+        """)
+
+    def _conn(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        # connections are in autocommit mode, so statements that must land
+        # together run in an explicit transaction
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _to_dict(self, row):
+        task = dict(row)
+        task['created_at'] = datetime.datetime.fromisoformat(task['created_at'])
+        return task
+
+    def _row(self, task):
+        return (
+            task['task_id'],
+            task['user_id'],
+            task['current_node_id'],
+            task['pipe_id'],
+            task['created_at'].isoformat(),
+            task['state'].value,
+            task['error'],
+            task['retries'],
+            task['split_status'],
+            task['jump_status']
+        )
+
+    def create(self, task_id, user_id, current_node_id, pipe_id, created_at, state, error, retries, split_status, jump_status):
+        return self.create_multi([{
+            'task_id': task_id,
+            'user_id': user_id,
+            'current_node_id': current_node_id,
+            'pipe_id': pipe_id,
+            'created_at': created_at,
+            'state': state,
+            'error': error,
+            'retries': retries,
+            'split_status': split_status,
+            'jump_status': jump_status
+        }])[0]
+
+    def create_multi(self, tasks):
+        rows = [self._row(task) for task in tasks]
+        with self._transaction() as conn:
+            conn.executemany(f"INSERT INTO tasks ({', '.join(self.columns)}) VALUES ({', '.join('?' * len(self.columns))})", rows)
+        return [dict(zip(self.columns, row), created_at=task['created_at']) for row, task in zip(rows, tasks)]
+
+    def update(self, task_id, **kwargs):
+        updates = {}
+        for key in ['state', 'error', 'current_node_id', 'retries', 'split_status', 'jump_status']:
+            if key in kwargs:
+                updates[key] = kwargs[key].value if key == 'state' else kwargs[key]
+
+        with self._transaction() as conn:
+            if updates:
+                assignments = ', '.join(f"{key} = ?" for key in updates)
+                cursor = conn.execute(f"UPDATE tasks SET {assignments} WHERE task_id = ?", (*updates.values(), task_id))
+                if cursor.rowcount == 0:
+                    raise Exception("task_id not found")
+            row = conn.execute("SELECT * FROM tasks WHERE task_id = ?", (task_id,)).fetchone()
+
+        if not row:
+            raise Exception("task_id not found")
+        return self._to_dict(row)
+
+    def fetch(self, **kwargs):
+        conditions = []
+        params = []
+        for key in ['task_id', 'user_id', 'pipe_id', 'current_node_id']:
+            if key in kwargs:
+                conditions.append(f"{key} = ?")
+                params.append(kwargs[key])
+
+        if 'task_ids' in kwargs:
+            task_ids = list(kwargs['task_ids'])
+            if not task_ids:
+                return []
+            conditions.append(f"task_id IN ({', '.join('?' * len(task_ids))})")
+            params.extend(task_ids)
+
+        if not conditions:
+            return []
+
+        rows = self._conn().execute(f"SELECT * FROM tasks WHERE {' AND '.join(conditions)}", params).fetchall()
+        return [self._to_dict(row) for row in rows]
+
+    def delete_older_than(self, hours=0, minutes=0, seconds=0):
+        threshold = datetime.datetime.utcnow() - \
+            datetime.timedelta(hours=hours, minutes=minutes, seconds=seconds)
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM tasks WHERE created_at < ?", (threshold.isoformat(),))
+
+    def delete(self, task_id=None, user_id=None, states=None):
+        conditions = []
+        params = []
+
+        if user_id:
+            conditions.append("user_id = ?")
+            params.append(user_id)
+
+        if task_id:
+            conditions.append("task_id = ?")
+            params.append(task_id)
+        elif states:
+            conditions.append(f"state IN ({', '.join('?' * len(states))})")
+            params.extend(states)
+        else:
+            return False
+
+        try:
+            with self._transaction() as conn:
+                conn.execute(f"DELETE FROM tasks WHERE {' AND '.join(conditions)}", params)
+        except sqlite3.Error:
+            return False
+
+        return True
+
+
 class AbstractTemplateStore(ABC):
 	@abstractmethod
 	def create(cls, name, user_id, text, input_fields=[], output_fields=[], extras=[], processor="jinja2"):
@@ -254,6 +506,7 @@ class NDBTemplateStore(ndb.Model):
             template.processor = processor
 
         template.put()
+        DefinitionVersion.bump('Template', template.template_id)
 
         return template.to_dict()
 
@@ -288,6 +541,12 @@ class NDBTemplateStore(ndb.Model):
     @classmethod
     @ndb_context_manager
     def get(cls, **kwargs: Dict[str, any]):
+        if 'template_id' in kwargs and set(kwargs) <= {'template_id', 'user_id'}:
+            return cached_definition('Template', kwargs['template_id'], kwargs.get('user_id'), lambda: cls._get(**kwargs))
+        return cls._get(**kwargs)
+
+    @classmethod
+    def _get(cls, **kwargs: Dict[str, any]):
         query_conditions = []
 
         if 'processor' in kwargs and 'user_id' in kwargs:
@@ -328,6 +587,7 @@ class NDBTemplateStore(ndb.Model):
 
         if entity:
             entity.key.delete()
+            DefinitionVersion.bump('Template', entity.template_id)
             return True
         else:
             return False
\ No newline at end of file
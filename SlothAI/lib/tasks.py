@@ -1,6 +1,11 @@
 import os
+import sys
 import json
+import zlib
+import base64
 import random
+import string
+from array import array
 from SlothAI.lib.schemar import Schemar
 from datetime import datetime, timedelta
 
@@ -14,8 +19,8 @@ from google.protobuf import timestamp_pb2
 
 from SlothAI.lib.gcloud import box_start
 from SlothAI.web.models import Box
-from SlothAI.lib.util import random_string, handle_quotes
-from SlothAI.lib.schemar import string_to_datetime, datetime_to_string, FBTypes
+from SlothAI.lib.util import handle_quotes
+from SlothAI.lib.schemar import detect_datetime_format, datetime_to_string, FBTypes
 
 from flask import current_app as app
 
@@ -108,6 +113,37 @@ class Task:
 		task_dict = json.loads(json_str)
 		return cls.from_dict(task_dict)
 
+	def to_wire(self, encoding="compact+zlib", document=None) -> bytes:
+		"""
+		Encode a Task for the queue. "json" is the to_json() format, "compact"
+		is compact JSON with long float lists packed as float64, and
+		"compact+zlib" is that compressed. A document passed in replaces the
+		task's own in the payload.
+		"""
+		task_dict = self.to_dict()
+		if document is not None:
+			task_dict['document'] = document
+
+		if encoding == "json":
+			return json.dumps(task_dict, indent=4).encode('utf-8')
+
+		payload = json.dumps(pack_floats(task_dict), separators=(',', ':')).encode('utf-8')
+		if encoding == "compact+zlib":
+			payload = zlib.compress(payload)
+		return payload
+
+	@classmethod
+	def from_wire(cls, data: bytes, encoding="compact+zlib") -> 'Task':
+		"""
+		Create a Task object from a payload made by to_wire().
+		"""
+		if encoding == "json":
+			return cls.from_json(data.decode('utf-8'))
+
+		if encoding == "compact+zlib":
+			data = zlib.decompress(data)
+		return cls.from_dict(json.loads(data, object_hook=unpack_floats))
+
 	def next_node(self):
 		if len(self.nodes) == 0:
 			return None
@@ -171,6 +207,53 @@ def delete_task(name):
 	pass
 
 
+# float lists at least this long (embeddings) travel packed. float64 keeps
+# every value exact.
+PACKED_FLOATS_MIN = 32
+
+# packed lists are objects whose only key is a marker. user keys that are a
+# marker, or start with the escape prefix, travel behind one more prefix so
+# user data never decodes as a packed list.
+PACKED_FLOATS_MARKERS = {"__f64__": 'd', "__f32__": 'f'}  # __f32__ is the packing of earlier versions
+PACKED_KEY_ESCAPE = "__esc__"
+
+def _escape_key(key):
+	if isinstance(key, str) and (key in PACKED_FLOATS_MARKERS or key.startswith(PACKED_KEY_ESCAPE)):
+		return PACKED_KEY_ESCAPE + key
+	return key
+
+
+def pack_floats(value):
+	if isinstance(value, dict):
+		return {_escape_key(key): pack_floats(item) for key, item in value.items()}
+	if isinstance(value, list):
+		if len(value) >= PACKED_FLOATS_MIN and all(type(item) is float for item in value):
+			floats = array('d', value)
+			if sys.byteorder == 'big':
+				floats.byteswap()
+			return {"__f64__": base64.b64encode(floats.tobytes()).decode('ascii')}
+		return [pack_floats(item) for item in value]
+	return value
+
+
+def unpack_floats(obj):
+	if len(obj) == 1:
+		for marker, typecode in PACKED_FLOATS_MARKERS.items():
+			if marker in obj:
+				floats = array(typecode)
+				floats.frombytes(base64.b64decode(obj[marker]))
+				if sys.byteorder == 'big':
+					floats.byteswap()
+				return floats.tolist()
+
+	if any(key.startswith(PACKED_KEY_ESCAPE) for key in obj):
+		return {
+			key[len(PACKED_KEY_ESCAPE):] if key.startswith(PACKED_KEY_ESCAPE) else key: item
+			for key, item in obj.items()
+		}
+	return obj
+
+
 def get_task_schema(data: Dict[str, any]) -> Tuple[Dict[str, str], str]:
 	'''
 	Populate with schema dict
@@ -261,7 +344,6 @@ def process_data_dict_for_insert(data, column_type_map, table):
 	# records = ["('abc123','Record 1',42)", "('def456','Record 2',57)"]
 	"""
 	
-	records = []
 	columns = list(data.keys())
 
 	if "_id" not in columns:
@@ -274,28 +356,68 @@ def process_data_dict_for_insert(data, column_type_map, table):
 	if not all_equal(data_lengths):
 		raise NonRetriableError("data dict for insert: length of values must be equal for all keys in data.")
 
-	# build insert tuple for each record
-	for i, _ in enumerate(data[list(data.keys())[0]]):
-		record = ""
-		for column in columns:
-			col_type = column_type_map[column]
-			if column == '_id':
-				if column not in list(data.keys()):
-					record += f"'{random_string(6)}'," if col_type == "string" else f"identifier('{table}'),"
-					continue
-			value = data[column][i]
-			if FBTypes.TIMESTAMP in col_type:
-				value = f"'{datetime_to_string(string_to_datetime(value))}'"
-			if col_type == FBTypes.STRING:
-				value = f"'{handle_quotes(value)}'"
-			if col_type == FBTypes.STRINGSET:
-				value = "['" + "','".join(handle_quotes(value)) + "']"	
-			record += f"{value},"
-		records.append(f"({record[:-1]})")
+	num_records = data_lengths[0] if data_lengths else 0
+
+	# format the values column by column, then join them into records
+	formatted = []
+	for column in columns:
+		col_type = column_type_map[column]
+		if column == '_id' and column not in data:
+			if col_type == "string":
+				formatted.append(random_ids(num_records))
+			else:
+				formatted.append([f"identifier('{table}')"] * num_records)
+			continue
+
+		formatted.append(list(map(column_formatter(col_type), data[column])))
+
+	records = ["(" + ",".join(record) + ")" for record in zip(*formatted)]
 
 	return columns, records
 
 
+def random_ids(count, size=6, chars=string.ascii_letters + string.digits):
+	# the same ids as util.random_string(), drawn in one call
+	draws = ''.join(random.choices(chars, k=count * size))
+	return [f"'{draws[i:i + size]}'" for i in range(0, count * size, size)]
+
+
+def column_formatter(col_type):
+	"""
+	Returns the function that formats one value of a column of `col_type` for
+	an INSERT statement.
+	"""
+	if FBTypes.TIMESTAMP in col_type:
+		return timestamp_formatter()
+	if col_type == FBTypes.STRING:
+		return lambda value: f"'{handle_quotes(value)}'"
+	if col_type == FBTypes.STRINGSET:
+		return lambda value: "['" + "','".join(handle_quotes(list(value))) + "']"
+	return str
+
+
+def timestamp_formatter():
+	# timestamps in a column nearly always share one format, so the format
+	# that parsed the last value is tried before detecting it again
+	last_format = None
+
+	def format_timestamp(value):
+		nonlocal last_format
+		dt = None
+		if last_format and isinstance(value, str):
+			try:
+				dt = datetime.strptime(value, last_format)
+			except ValueError:
+				dt = None
+		if dt is None:
+			last_format = detect_datetime_format(value)
+			if last_format:
+				dt = datetime.strptime(value, last_format)
+		return f"'{datetime_to_string(dt)}'"
+
+	return format_timestamp
+
+
 from itertools import groupby
 def all_equal(iterable):
 	g = groupby(iterable)
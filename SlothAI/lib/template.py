@@ -1,10 +1,21 @@
 import re
 import ast
+import copy
 import json
 from datetime import datetime
+from functools import lru_cache
 
 from SlothAI.lib.util import random_string
 
+# template text only changes on edit, so the patterns are compiled once and
+# the parse results are cached on the text itself
+extras_pattern = re.compile(r'extras\s*=\s*{((?:[^{}]|{{[^{}]*}})*)}', re.DOTALL)
+extras_line_pattern = re.compile(r'^\s*extras\s*=\s*{[^{}]*({{[^}]*}}[^{}]*)*}\s*$', re.MULTILINE)
+input_fields_pattern = re.compile(r'input_fields\s*=\s*(\[.*?\])', re.DOTALL)
+output_fields_pattern = re.compile(r'output_fields\s*=\s*(\[.*?\])', re.DOTALL)
+
+TEMPLATE_PARSE_CACHE_SIZE = 512
+
 class MissingTemplateKey(Exception):
     def __init__(self, key: str) -> None:
         super().__init__(f"Missing template key: {key}")
@@ -106,50 +117,18 @@ class Template():
     @classmethod
     def extras_from_template(self, template):
         # TODO: remove comments before processing...
-        # only uses the last pattern. leaving these here for testing.
-        # extras_pattern = re.compile(r'extras\s*=\s*{([\s\S]*?)}\s*', re.DOTALL)
-        # extras_pattern = re.compile(r'extras\s*=\s*{([\s\S]*?)}\s*}', re.DOTALL)
-        # extras_pattern = re.compile(r'extras\s*=\s*{.*?}', re.DOTALL)
-        # extras_pattern = re.compile(r'extras\s*=\s*\{(?:\s*".*?"\s*:\s*".*?"\s*,?)*}', re.DOTALL)
-        extras_pattern = re.compile(r'extras\s*=\s*{((?:[^{}]|{{[^{}]*}})*)}', re.DOTALL)
-        
-        extras_matches = extras_pattern.findall(template)
-
-        try:
-            extras_content = ast.literal_eval("{" + extras_matches[0] + "}")
-            if not isinstance(extras_content, dict):
-                raise InvalidTemplateExtras(f"extras not evaluated to dict: got {type(extras_content)}")
-            return extras_content
-        except Exception as ex:
-            raise InvalidTemplateExtras(str(ex))
+        # the cached result is shared, hand out a copy
+        return copy.deepcopy(_parse_extras(template))
 
     @classmethod
     def fields_from_template(self, template):
-        input_fields = []
-        output_fields = []
-
-        input_content, output_content = self.fields_text_from_template(template)
-
-        try:
-            input_fields = ast.literal_eval(input_content) if input_content else None
-        except Exception as e:
-            raise InvalidTemplateInputFields(str(e))
-        
-        try:
-            output_fields = ast.literal_eval(output_content) if output_content else None
-        except Exception as e:
-            raise InvalidTemplateOutputFields(str(e))
-
-        return input_fields, output_fields
+        return copy.deepcopy(_parse_fields(template))
 
     @classmethod
     def fields_text_from_template(self, template):
-        # Regular expressions to find input and output fields in the template
-        input_pattern = re.compile(r'input_fields\s*=\s*(\[.*?\])', re.DOTALL)
-        output_pattern = re.compile(r'output_fields\s*=\s*(\[.*?\])', re.DOTALL)
-
-        input_match = input_pattern.search(template)
-        output_match = output_pattern.search(template)
+        # find input and output fields in the template
+        input_match = input_fields_pattern.search(template)
+        output_match = output_fields_pattern.search(template)
 
         input_content = input_match.group(1) if input_match else None
         output_content = output_match.group(1) if output_match else None
@@ -158,19 +137,47 @@ class Template():
 
     @classmethod
     def remove_fields_and_extras(self, template):
-        # Remove extras definition
-        extras_pattern = re.compile(r'extras\s*=\s*{([\s\S]*?)}\s*', re.DOTALL)
-        extras_pattern = re.compile(r'\s*extras\s*=\s*{.*?}\s*$', re.DOTALL)
-        extras_pattern = re.compile(r'^\s*extras\s*=\s*{[^{}]*({{[^}]*}}[^{}]*)*}\s*$', re.MULTILINE)
+        return _strip_fields_and_extras(template)
+
+
+@lru_cache(maxsize=TEMPLATE_PARSE_CACHE_SIZE)
+def _parse_extras(template):
+    extras_matches = extras_pattern.findall(template)
+
+    try:
+        extras_content = ast.literal_eval("{" + extras_matches[0] + "}")
+        if not isinstance(extras_content, dict):
+            raise InvalidTemplateExtras(f"extras not evaluated to dict: got {type(extras_content)}")
+        return extras_content
+    except Exception as ex:
+        raise InvalidTemplateExtras(str(ex))
+
+
+@lru_cache(maxsize=TEMPLATE_PARSE_CACHE_SIZE)
+def _parse_fields(template):
+    input_content, output_content = Template.fields_text_from_template(template)
+
+    try:
+        input_fields = ast.literal_eval(input_content) if input_content else None
+    except Exception as e:
+        raise InvalidTemplateInputFields(str(e))
+
+    try:
+        output_fields = ast.literal_eval(output_content) if output_content else None
+    except Exception as e:
+        raise InvalidTemplateOutputFields(str(e))
+
+    return input_fields, output_fields
 
-        template = extras_pattern.sub('', template)
 
-        # Remove input_fields and output_fields definitions
-        input_pattern = re.compile(r'input_fields\s*=\s*(\[.*?\])', re.DOTALL)
-        template = input_pattern.sub('', template)
+@lru_cache(maxsize=TEMPLATE_PARSE_CACHE_SIZE)
+def _strip_fields_and_extras(template):
+    # Remove extras definition
+    template = extras_line_pattern.sub('', template)
 
-        output_pattern = re.compile(r'output_fields\s*=\s*(\[.*?\])', re.DOTALL)
-        template = output_pattern.sub('', template)
+    # Remove input_fields and output_fields definitions
+    template = input_fields_pattern.sub('', template)
+    template = output_fields_pattern.sub('', template)
 
-        return template
+    return template
 
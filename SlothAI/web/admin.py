@@ -0,0 +1,26 @@
+from flask import Blueprint, jsonify, abort
+
+import flask_login
+from flask_login import current_user
+
+from SlothAI.web.models import definition_cache
+from SlothAI.lib.processor import compiled_templates
+from SlothAI.lib.database import schema_cache, client_pool, weaviate_pool
+from SlothAI.lib.pdf_text import page_cache
+
+admin = Blueprint('admin', __name__)
+
+@admin.route('/admin/stats', methods=['GET'])
+@flask_login.login_required
+def stats():
+    if not current_user.admin:
+        abort(404)
+
+    return jsonify({
+        "definition_cache": definition_cache.stats(),
+        "jinja_cache": compiled_templates.stats(),
+        "featurebase_schema_cache": schema_cache.stats(),
+        "featurebase_clients": client_pool.stats(),
+        "weaviate_clients": weaviate_pool.stats(),
+        "pdf_page_cache": page_cache.stats()
+    })
@@ -5,7 +5,7 @@ from flask import current_app as app
 from flask_login import login_user, login_manager, logout_user, login_required, current_user
 import flask_login
 
-from SlothAI.web.models import User, Transaction, Pipeline, Node, Template
+from SlothAI.web.models import User, Transaction, Pipeline, Node, Template, ndb_context
 from SlothAI.lib.util import random_string, email_user, sms_user, generate_token, random_number, random_string, slacker
 
 
@@ -14,9 +14,6 @@ import datetime
 import phonenumbers
 from email_validator import validate_email, EmailNotValidError
 
-# client connection
-client = ndb.Client()
-
 def get_brand(app):
     # brand setup
     brand = {}
@@ -140,7 +137,7 @@ def login_post():
 
     # only allow posts with transaction IDs (move to a decorator?)
     if transaction_id:
-        with client.context():
+        with ndb_context():
             transaction = Transaction.query().filter(Transaction.tid==transaction_id).get()
 
             # if we find it, delete it and proceed
@@ -203,7 +200,7 @@ def login_post():
             # generate code for use after auth.verify
             phone_code = random_number(6)
 
-            with client.context():
+            with ndb_context():
                 # rotate code
                 # TODO: Add additional 2FA with Google Authenticator
                 user.phone_code = phone_code
@@ -214,7 +211,7 @@ def login_post():
             return redirect(url_for('auth.verify_phone', **options))
 
     # rotate the token
-    with client.context():
+    with ndb_context():
         # only rotate if we have confirmed this user by email
         if user.mail_confirm:   
             mail_token = generate_token()
@@ -240,7 +237,7 @@ def login_post():
         flash("Maximum retries for this email.")
         return redirect(url_for('auth.login'))
     else:
-        with client.context():
+        with ndb_context():
             user.mail_tries = user.mail_tries + 1
             user.updated = datetime.datetime.utcnow()
             user.put()
@@ -398,7 +395,7 @@ def verify_phone_post():
             return redirect(url_for('auth.login', **options))
     else:
         # silently reset the code, because validation was wrong
-        with client.context():
+        with ndb_context():
             user.phone_code = generate_token() # secure phone code
             user.put()
         return redirect(url_for('auth.tfa', **options))
@@ -445,7 +442,7 @@ def token():
         
         if user:
             # rotate token
-            with client.context():
+            with ndb_context():
                 user.mail_token = generate_token()
                 user.mail_confirm = True
                 user.authenticated = True
@@ -509,7 +506,7 @@ def token_post():
         try:
             if user.email == email:
                 # rotate token, set logins
-                with client.context():
+                with ndb_context():
                     user.mail_token = generate_token()
                     user.mail_confirm = True
                     user.authenticated = True
@@ -596,7 +593,7 @@ def phone_post():
 
     # rotate the current logged in user's code
     user = User.get_by_uid(current_user.uid)
-    with client.context():
+    with ndb_context():
         user.phone_code = random_number(6)
         user.phone = phone_e164
         user.updated = datetime.datetime.utcnow()
@@ -662,7 +659,7 @@ def tfa_post():
         # wrong code? we should reset the token and count failures
         # if this code never runs, there will be a 6 digit token in
         # the user's account which will never expire.
-        with client.context():
+        with ndb_context():
             if user:
                 user.phone_code = generate_token()
                 user.failed_2fa_attempts = user.failed_2fa_attempts + 1
@@ -673,7 +670,7 @@ def tfa_post():
         return redirect(url_for('auth.login', **options))
 
     # update user
-    with client.context():
+    with ndb_context():
         user.phone = phone
         user.phone_code = generate_token()  # secure phone code
         user.paid = True
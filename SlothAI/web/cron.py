@@ -1,8 +1,9 @@
 import re
-from flask import Blueprint, jsonify
+from flask import Blueprint, jsonify, request
 from flask import current_app as app
 from SlothAI.lib.gcloud import box_status
 from SlothAI.web.models import Box
+from SlothAI.lib.storage import NDBTaskStore
 
 cron = Blueprint('cron', __name__)
 
@@ -54,4 +55,29 @@ def status_handler(box_id="all", cron_key=""):
            app.logger.info(f"Deleting old box: {_box.get('box_id')}")
            Box.delete(_box.get('box_id'))
 
-   return jsonify(_boxes)
\ No newline at end of file
+   return jsonify(_boxes)
+
+@cron.route('/cron/tasks/migrate/<cron_key>', methods=['GET'])
+def migrate_tasks_handler(cron_key=""):
+   """
+   Moves Task entities written before tasks were keyed by task_id over to keyed
+   entities, in pages, up to a bounded number per call. Tasks are also moved
+   the first time they are looked up. A call resumes from the `cursor` query
+   parameter returned by the previous one.
+
+   Args:
+       cron_key (str): The cron key for authentication.
+
+   Returns:
+       dict: The number of tasks migrated, the cursor to resume from, and
+       whether any are left.
+   """
+   if cron_key != app.config['CRON_KEY']:
+       app.logger.warning("Invalid cron key")
+       return jsonify({})
+
+   if not isinstance(app.config['task_service'].task_store, NDBTaskStore):
+       return jsonify({"migrated": 0, "cursor": None, "done": True})
+
+   migrated, cursor, done = NDBTaskStore.migrate_keys(cursor=request.args.get('cursor'))
+   return jsonify({"migrated": migrated, "cursor": cursor, "done": done})
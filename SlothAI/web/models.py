@@ -1,4 +1,6 @@
+import copy
 import datetime
+from contextlib import contextmanager
 import zlib
 import base64
 
@@ -7,20 +9,82 @@ from google.cloud import ndb
 import flask_login
 
 from SlothAI.lib.util import random_name, random_string, generate_token
+from SlothAI.lib.cache import LRUCache
 
 import config as config
 
-# client connection
+# client connection, one per worker process and shared by every context
 client = ndb.Client()
 
+# kinds read far more often than they are written use the in-context cache
+cached_kinds = {'User', 'Token', 'Pipeline', 'Node', 'Template', 'DefinitionVersion'}
+
+def cache_policy(key):
+    return key.kind() in cached_kinds
+
+@contextmanager
+def ndb_context():
+    """
+    Opens an ndb context on the shared client, or reuses the context already
+    open on this thread (the request's or the task's), so nested model calls
+    share one context and its cache.
+    """
+    if ndb.get_context(False) is not None:
+        yield
+    else:
+        with client.context(cache_policy=cache_policy):
+            yield
+
 # Create a context manager decorator
 def ndb_context_manager(func):
     def wrapper(*args, **kwargs):
-        with ndb.Client().context():
+        with ndb_context():
             result = func(*args, **kwargs)
         return result  # Return the result outside the context
     return wrapper
 
+# process wide cache for pipeline, node and template definitions
+definition_cache = LRUCache(maxsize=1024)
+
+class DefinitionVersion(ndb.Model):
+    """
+    Version stamp for a pipeline, node or template definition. Writes bump the
+    stamp so cached copies held by any worker are dropped on their next lookup.
+    Must be called from inside an ndb context.
+    """
+    version = ndb.StringProperty()
+    updated = ndb.DateTimeProperty()
+
+    @classmethod
+    def current(cls, kind, definition_id):
+        entity = ndb.Key(cls, f"{kind}:{definition_id}").get()
+        return entity.version if entity else None
+
+    @classmethod
+    def bump(cls, kind, definition_id):
+        cls(
+            id=f"{kind}:{definition_id}",
+            version=random_string(13),
+            updated=datetime.datetime.utcnow()
+        ).put()
+
+
+def cached_definition(kind, definition_id, uid, load):
+    # read the version before loading, so a write racing with us can only
+    # leave behind an entry with an outdated stamp
+    version = DefinitionVersion.current(kind, definition_id)
+    cache_key = (kind, uid, definition_id)
+
+    definition = definition_cache.get(cache_key, version)
+    if definition is None:
+        definition = load()
+        if not definition:
+            return None
+        definition_cache.put(cache_key, definition, version)
+
+    # callers are free to modify what they get back
+    return copy.deepcopy(definition)
+
 class Transaction(ndb.Model):
     uid = ndb.StringProperty()
     tid = ndb.StringProperty()
@@ -68,6 +132,7 @@ class Template(ndb.Model):
         if templates:
             for template in templates:
                 template.key.delete()
+                DefinitionVersion.bump('Template', template.template_id)
             return True
         return False
 
@@ -121,6 +186,7 @@ class Template(ndb.Model):
         template.processor = processor
 
         template.put()
+        DefinitionVersion.bump('Template', template.template_id)
 
         return template.to_dict()
 
@@ -218,6 +284,7 @@ class Node(ndb.Model):
         if nodes:
             for node in nodes:
                 node.key.delete()
+                DefinitionVersion.bump('Node', node.node_id)
             return True
         return False
 
@@ -227,6 +294,7 @@ class Node(ndb.Model):
         node = cls.query(cls.uid == uid, cls.node_id == node_id).get()
         node.name = new_name
         node.put()
+        DefinitionVersion.bump('Node', node.node_id)
         return node.to_dict()
 
     @classmethod
@@ -247,6 +315,7 @@ class Node(ndb.Model):
         
         # Save the updated node
         node.put()
+        DefinitionVersion.bump('Node', node.node_id)
         
         return node.to_dict()
 
@@ -299,12 +368,19 @@ class Node(ndb.Model):
         node.template_id = template_id
 
         node.put()
+        DefinitionVersion.bump('Node', node.node_id)
 
         return node.to_dict()
 
     @classmethod
     @ndb_context_manager
     def get(cls, **kwargs):
+        if 'node_id' in kwargs and set(kwargs) <= {'node_id', 'uid'}:
+            return cached_definition('Node', kwargs['node_id'], kwargs.get('uid'), lambda: cls._get(**kwargs))
+        return cls._get(**kwargs)
+
+    @classmethod
+    def _get(cls, **kwargs):
         query_conditions = []
 
         if 'node_id' in kwargs:
@@ -369,6 +445,7 @@ class Node(ndb.Model):
 
         if entities:
             entities.key.delete()
+            DefinitionVersion.bump('Node', entities.node_id)
             return True
         else:
             return False
@@ -397,6 +474,7 @@ class Pipeline(ndb.Model):
         if pipes:
             for pipe in pipes:
                 pipe.key.delete()
+                DefinitionVersion.bump('Pipeline', pipe.pipe_id)
             return True
         return False
 
@@ -420,6 +498,7 @@ class Pipeline(ndb.Model):
         else:
             pipeline.node_ids = node_ids
             pipeline.put()
+            DefinitionVersion.bump('Pipeline', pipeline.pipe_id)
 
         return pipeline.to_dict()
 
@@ -429,6 +508,7 @@ class Pipeline(ndb.Model):
         pipeline = cls.query(cls.uid == uid, cls.pipe_id == pipe_id).get()
         pipeline.name = new_name
         pipeline.put()
+        DefinitionVersion.bump('Pipeline', pipeline.pipe_id)
         return pipeline.to_dict()
 
     @classmethod
@@ -443,6 +523,7 @@ class Pipeline(ndb.Model):
 
             # Save the changes
             pipeline.put()
+            DefinitionVersion.bump('Pipeline', pipeline.pipe_id)
 
             return pipeline.to_dict()  # Return the updated pipeline as a dictionary
         else:
@@ -464,6 +545,12 @@ class Pipeline(ndb.Model):
     @classmethod
     @ndb_context_manager
     def get(cls, **kwargs):
+        if 'pipe_id' in kwargs and set(kwargs) <= {'pipe_id', 'uid'}:
+            return cached_definition('Pipeline', kwargs['pipe_id'], kwargs.get('uid'), lambda: cls._get(**kwargs))
+        return cls._get(**kwargs)
+
+    @classmethod
+    def _get(cls, **kwargs):
         query_conditions = []
 
         if 'pipe_id' in kwargs:
@@ -513,6 +600,7 @@ class Pipeline(ndb.Model):
         pipe = cls.query(cls.pipe_id == pipe_id).get()
         if pipe:
             pipe.key.delete()
+            DefinitionVersion.bump('Pipeline', pipe.pipe_id)
             return True
         return False
 
@@ -717,7 +805,7 @@ class User(flask_login.UserMixin, ndb.Model):
 
     @classmethod
     def get_by_email(cls, email):
-        with client.context():
+        with ndb_context():
             return cls.query(cls.email == email).get()
 
     @classmethod
@@ -749,7 +837,7 @@ class User(flask_login.UserMixin, ndb.Model):
 
     @classmethod
     def get_by_mail_token(cls, mail_token):
-        with client.context():
+        with ndb_context():
             return cls.query(cls.mail_token == mail_token).get()
 
     @classmethod
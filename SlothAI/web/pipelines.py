@@ -24,9 +24,6 @@ from SlothAI.web.nodes import node_create
 
 pipeline = Blueprint('pipeline', __name__)
 
-# client connection
-client = ndb.Client()
-
 
 # API HANDLERS
 @pipeline.route('/pipelines/list', methods=['GET'])
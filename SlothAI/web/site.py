@@ -20,12 +20,10 @@ from google.cloud import storage
 
 from SlothAI.lib.util import email_user, random_name, gpt_dict_completion, github_cookbooks, load_template, load_from_storage, merge_extras, should_be_service_token, callback_extras
 from SlothAI.web.models import Pipeline, Node, Log, User, Token
+from SlothAI.lib.local_embeddings import is_available
 
 site = Blueprint('site', __name__, static_folder='static')
 
-# client connection
-client = ndb.Client()
-
 # date for base pages cards
 current_date = datetime.datetime.now().strftime("%Y-%m-%dT%H:%M:%S+00:00")
 
@@ -109,6 +107,11 @@ template_examples = [
     {"name": "Convert text to speech (ElevenLabs)", "template_name": "text_to_speech_el", "processor_type": "aispeech"},
 ]
 
+# local embedding models need the optional sentence-transformers install
+if is_available("all-MiniLM-L6-v2"):
+    template_examples.insert(6, {"name": "Convert text to a local CPU embedding", "template_name": "text_to_local_embedding", "processor_type": "embedding"})
+
+
 def get_brand(app):
     # brand setup
     brand = {}
@@ -1,4 +1,5 @@
 import json
+import time
 import traceback
 
 from flask import Blueprint, request, jsonify
@@ -7,6 +8,7 @@ import flask_login
 from flask_login import current_user
 
 from SlothAI.lib.processor import process
+from SlothAI.lib.blobs import LazyDocument
 from SlothAI.lib.tasks import Task, RetriableError, NonRetriableError, TaskState, TaskNotFoundError
 import SlothAI.lib.services as services
 # from SlothAI.web.models import Task as TaskModel
@@ -15,44 +17,72 @@ tasks = Blueprint('tasks', __name__)
 
 @tasks.route('/tasks/process/<cron_key>', methods=['POST'])
 def process_tasks(cron_key):
-    try:
-        # validate call with a key
-        if cron_key != app.config['CRON_KEY']:
-            raise NonRetriableError("invalid cron key")
+    # validate call with a key
+    if cron_key != app.config['CRON_KEY']:
+        app.logger.warning("Invalid cron key")
+        return "Invalid cron key", 401
 
-        task_service = app.config['task_service']
+    # Parse the task payload sent in the request.
+    # payloads queued before TASK_WIRE_FORMAT was set have no encoding header
+    task = Task.from_wire(request.get_data(), request.headers.get('X-Task-Encoding', "json"))
+
+    # spilled document fields are loaded when a processor reads them
+    blob_store = app.config.get('blob_store')
+    if blob_store:
+        task.document = LazyDocument.from_wire(task.document, blob_store)
 
-        # Parse the task payload sent in the request.
-        task = Task.from_json(request.get_data(as_text=True))
+    return run_task(task)
+
+
+def run_task(task):
+    """
+    Runs a delivered task through its nodes and hands it back to the task queue
+    or finishes it. Used by the /tasks/process endpoint and by in-process queues.
+    """
+    try:
+        task_service = app.config['task_service']
 
         # clear any errors
         task.error = None
-        task_stored = task_service.fetch_tasks(task_id=task.id)
-        # app.logger.debug(task_stored)
 
-        if len(task_stored) == 0:
-            app.logger.debug(f"Task {task.id} not found. Removing from queue.")
-            return "Task not found", 200
+        # run processors, staying in this request for as long as the nodes are
+        # synchronous and the budget allows. nodes waiting on an external
+        # callback (aigrub, aiffmpeg, instructor embeddings, easyocr) park the
+        # task themselves, which empties the node list and ends the loop.
+        budget = float(app.config.get('TASK_INLINE_SECONDS', 0))
+        started = time.monotonic()
+        while True:
+            # the task may have been cancelled or deleted since the last node
+            check_stored_state(task_service, task)
+
+            task = process(task)
 
-        if len(task_stored) != 1:
-            raise Exception("Logic error: multiple tasks with same id")
+            # remove the current node so we'll move on
+            node = task.remove_node()
 
-        if task_stored[0]['state'] != TaskState.RUNNING.value:
-            raise services.InvalidStateForProcess(task_stored.state.value)
+            app.logger.info(f"Successfully processed task with id {task.id} on node with id {node} in pipeline with id {task.pipe_id}")
 
-        # run processors
-        task = process(task)
+            if len(task.nodes) == 0:
+                break
 
-        # remove the current node so we'll move on
-        node = task.remove_node()
+            if time.monotonic() - started >= budget:
+                break
 
-        # queue the next ndoe
+        # queue the next node
         if len(task.nodes) > 0:
             task_service.queue_task(task)
         else:
             task_service.update_task(task_id=task.id, state=TaskState.COMPLETED)
 
-        app.logger.info(f"Successfully processed task with id {task.id} on node with id {node} in pipeline with id {task.pipe_id}")
+    # these two are NonRetriableErrors, so they are caught before it
+    except TaskNotFoundError:
+        app.logger.debug(f"Task {task.id} not found. Removing from queue.")
+        return "Task not found", 200
+
+    except services.InvalidStateForProcess as e:
+        # state likely changed during processing a task, don't requeue
+        # TODO: this could be drop task but drop_task should accept a final state.
+        return "Invalid state for processing", 200
 
     except RetriableError as e:
         task.error = str(e)
@@ -65,11 +95,6 @@ def process_tasks(cron_key):
         task_service.drop_task(task)
         return f"Error in task: {task.error}", 200
 
-    except services.InvalidStateForProcess as e:
-        # state likely changed during processing a task, don't requeue
-        # TODO: this could be drop task but drop_task should accept a final state.
-        return "Invalid state for processing", 200
-
     except Exception as e:
         traceback.print_exc()
         task.error = str(e)
@@ -79,6 +104,16 @@ def process_tasks(cron_key):
     return "Successfully completed node", 200
 
 
+def check_stored_state(task_service, task):
+    # raises unless the stored task exists and is still running
+    task_stored = task_service.fetch_tasks(task_id=task.id)
+    if len(task_stored) == 0:
+        raise TaskNotFoundError(task.id)
+
+    if task_stored[0]['state'] != TaskState.RUNNING.value:
+        raise services.InvalidStateForProcess(task_stored[0]['state'])
+
+
 @tasks.route('/tasks', methods=['DELETE'])
 @flask_login.login_required
 def delete_tasks():
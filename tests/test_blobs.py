@@ -0,0 +1,78 @@
+import os
+import sys
+import copy
+import json
+import tempfile
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from SlothAI.lib.blobs import LocalBlobStore, LazyDocument, BlobRef, spill_document, known_blobs
+
+class CountingBlobStore(LocalBlobStore):
+    def __init__(self, path):
+        super().__init__(path)
+        self.puts = 0
+        self.gets = 0
+
+    def put(self, key, data):
+        self.puts += 1
+        super().put(key, data)
+
+    def get(self, key):
+        self.gets += 1
+        return super().get(key)
+
+
+class TestBlobs(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = CountingBlobStore(self.tmp.name)
+        known_blobs.clear()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_spill_and_lazy_load(self):
+        document = {
+            "text": ["small"],
+            "embedding": [[0.5] * 200 for _ in range(10)]
+        }
+
+        wire = json.loads(json.dumps(spill_document(document, self.store, threshold=1024)))
+        self.assertEqual(wire["text"], ["small"])
+        self.assertIn("__blob__", wire["embedding"])
+        self.assertEqual(self.store.puts, 1)
+
+        lazy = LazyDocument.from_wire(wire, self.store)
+        self.assertIsInstance(lazy.raw("embedding"), BlobRef)
+        self.assertEqual(lazy["text"], ["small"])
+        self.assertEqual(self.store.gets, 0)
+
+        self.assertEqual(lazy.get("embedding"), document["embedding"])
+        self.assertEqual(self.store.gets, 1)
+
+        # a loaded field is only read once, and plain copies are fully loaded
+        self.assertEqual(dict(lazy), document)
+        self.assertEqual(copy.deepcopy(lazy), document)
+        self.assertEqual(self.store.gets, 1)
+
+    def test_untouched_fields_are_not_uploaded_again(self):
+        document = {"embedding": [[0.5] * 200 for _ in range(10)]}
+        wire = spill_document(document, self.store, threshold=1024)
+
+        lazy = LazyDocument.from_wire(wire, self.store)
+        lazy["text"] = ["new"]
+
+        spilled = spill_document(lazy, self.store, threshold=1024)
+        self.assertEqual(spilled["embedding"], wire["embedding"])
+        self.assertEqual(spilled["text"], ["new"])
+        self.assertEqual(self.store.puts, 1)
+        self.assertEqual(self.store.gets, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from SlothAI.lib.cache import LRUCache
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_evicts_least_recently_used(self):
+        cache = LRUCache(maxsize=2)
+        cache.put("a", 1)
+        cache.put("b", 2)
+        self.assertEqual(cache.get("a"), 1)
+        cache.put("c", 3)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_version_mismatch_is_a_miss(self):
+        cache = LRUCache()
+        cache.put("pipe", {"name": "old"}, version="v1")
+
+        self.assertEqual(cache.get("pipe", version="v1"), {"name": "old"})
+        self.assertIsNone(cache.get("pipe", version="v2"))
+        # the stale entry is dropped
+        self.assertIsNone(cache.get("pipe", version="v1"))
+
+        stats = cache.stats()
+        self.assertEqual(stats["hits"], 1)
+        self.assertEqual(stats["misses"], 2)
+        self.assertEqual(stats["size"], 0)
+
+    def test_byte_budget(self):
+        cache = LRUCache(maxsize=100, maxbytes=10, sizeof=len)
+        cache.put("a", "xxxx")
+        cache.put("b", "xxxx")
+        cache.put("c", "xxxx")
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("c"), "xxxx")
+        self.assertEqual(cache.stats()["bytes"], 8)
+
+        # replacing an entry counts its new size only
+        cache.put("c", "xx")
+        self.assertEqual(cache.stats()["bytes"], 6)
+
+        # a value over the budget isn't kept
+        cache.put("d", "x" * 20)
+        self.assertIsNone(cache.get("d"))
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+import os
+import sys
+import unittest
+
+from io import BytesIO
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from SlothAI.lib.csv_stream import csv_windows, csv_texts
+
+CSV = b"""exported by someone,,
+name,age,score
+alice,30,1.5
+bob,,2
+
+carol,41,
+dave,52,3
+"""
+
+class TestCSVStream(unittest.TestCase):
+
+    def test_single_window(self):
+        windows = list(csv_windows(BytesIO(CSV)))
+        self.assertEqual(len(windows), 1)
+
+        offset, columns = windows[0]
+        self.assertEqual(offset, 0)
+        self.assertEqual(columns["name"], ["alice", "bob", "carol", "dave"])
+        self.assertEqual(columns["age"], [30, 0, 41, 52])
+        self.assertEqual(columns["score"], [1.5, 2.0, 0.0, 3.0])
+        self.assertEqual(csv_texts(columns)[1], "age:30,0,41,52")
+
+    def test_windows(self):
+        windows = list(csv_windows(BytesIO(CSV), window_rows=3, prepend_string="p_"))
+        self.assertEqual([offset for offset, _ in windows], [0, 3])
+        self.assertEqual(windows[0][1]["p_name"], ["alice", "bob", "carol"])
+        self.assertEqual(windows[1][1]["p_name"], ["dave"])
+
+        # the float type of the first window is kept for the second
+        self.assertEqual(windows[1][1]["p_score"], [3.0])
+        self.assertIsInstance(windows[1][1]["p_score"][0], float)
+
+    def test_start_and_count(self):
+        windows = list(csv_windows(BytesIO(CSV), window_rows=2, start=1, count=2))
+        self.assertEqual(len(windows), 1)
+        offset, columns = windows[0]
+        self.assertEqual(offset, 1)
+        self.assertEqual(columns["name"], ["bob", "carol"])
+
+    def test_mixed_and_empty(self):
+        data = b"id,code,note\n1,007,\n2,x,\n"
+        _, columns = next(csv_windows(BytesIO(data)))
+        self.assertEqual(columns["id"], [1, 2])
+        self.assertEqual(columns["code"], ["007", "x"])
+        self.assertEqual(columns["note"], [None, None])
+
+        self.assertEqual(list(csv_windows(BytesIO(b""))), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
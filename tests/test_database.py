@@ -1,11 +1,19 @@
 import sys
 import os
+import json
 import unittest
+import threading
 
 current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
+from unittest.mock import patch
+from urllib.error import HTTPError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from flask import Flask
+
 import SlothAI.lib.database as db
 
 class TestAddFiltersToSql(unittest.TestCase):
@@ -45,5 +53,278 @@ class TestAddFiltersToSql(unittest.TestCase):
             modified_sql_query = db.add_filters_to_sql(test['original_sql_query'], test['column_value_dict'])
             self.assertEqual(modified_sql_query, test['expected_query'], f"test {test['name']} failed")
 
+class TestBulkInsert(unittest.TestCase):
+
+    def test_insert_chunks(self):
+        records = [f"({i},'{'x' * 10}')" for i in range(10)]
+        chunks = db.insert_chunks("t", ["_id", "text"], records, max_bytes=100)
+
+        self.assertEqual(chunks[0][0], 0)
+        self.assertEqual(chunks[-1][1], 10)
+        for (_, stop, _), (start, _, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(stop, start)
+        for start, stop, sql in chunks:
+            self.assertLessEqual(len(sql), 100)
+            self.assertEqual(sql, f"INSERT INTO t (_id,text) VALUES {','.join(records[start:stop])};")
+
+        # written ranges are skipped and split the chunks around them
+        chunks = db.insert_chunks("t", ["_id", "text"], records, max_bytes=1000, written=[[2, 5]])
+        self.assertEqual([(start, stop) for start, stop, _ in chunks], [(0, 2), (5, 10)])
+
+        # an oversized record still goes out, on its own
+        chunks = db.insert_chunks("t", ["_id"], ["(1)", "(" + "9" * 50 + ")", "(2)"], max_bytes=40)
+        self.assertEqual([(start, stop) for start, stop, _ in chunks], [(0, 1), (1, 2), (2, 3)])
+
+    def test_bulk_insert_retries_chunks(self):
+        app = Flask(__name__)
+        calls = []
+        failed = set()
+
+        def query(document):
+            calls.append(document['sql'])
+            if "(3)" in document['sql'] and document['sql'] not in failed:
+                failed.add(document['sql'])
+                return None, db.QueryError("featurebase_query: exception: timed out", retriable=True)
+            if "(7)" in document['sql']:
+                # rejected sql is not retried, whatever its text holds
+                return None, db.QueryError("featurebase_query: bad value 'exception'")
+            return object(), None
+
+        records = [f"({i})" for i in range(10)]
+        with app.app_context(), patch.object(db, 'featurebase_query', query), patch.object(db.time, 'sleep'):
+            stats, errors = db.featurebase_bulk_insert("t", ["_id"], records, {}, max_bytes=30, workers=4)
+
+        self.assertEqual([stat['start'] for stat in stats], sorted(stat['start'] for stat in stats))
+        self.assertEqual(errors, ["featurebase_query: bad value 'exception'"])
+
+        retried = [stat for stat in stats if stat['start'] <= 3 < stat['stop']][0]
+        self.assertEqual(retried['attempts'], 2)
+        self.assertIsNone(retried['error'])
+
+        # sql errors are not sent again
+        rejected = [stat for stat in stats if stat['start'] <= 7 < stat['stop']][0]
+        self.assertEqual(rejected['attempts'], 1)
+
+    def test_request_errors(self):
+        self.assertTrue(db.is_retriable(db.request_error(HTTPError("url", 503, "unavailable", {}, None))))
+        self.assertTrue(db.is_retriable(db.request_error(HTTPError("url", 429, "too many", {}, None))))
+        self.assertTrue(db.is_retriable(db.request_error(ConnectionError("reset"))))
+
+        denied = db.request_error(HTTPError("url", 401, "unauthorized", {}, None))
+        self.assertFalse(db.is_retriable(denied))
+        self.assertEqual(denied.status, 401)
+
+        # plain strings, like the messages of other query functions, aren't
+        self.assertFalse(db.is_retriable("featurebase_query: exception: timed out"))
+
+
+class TestSchemaCache(unittest.TestCase):
+
+    def setUp(self):
+        db.schema_cache.clear()
+
+    def test_schema_cache(self):
+        auth = {"dbid": "db1", "db_token": "token"}
+        self.assertIsNone(db.cached_columns("t", auth))
+
+        db.remember_columns("t", auth, {"_id": "id", "text": "string"})
+        columns = db.cached_columns("t", auth)
+        self.assertEqual(columns, {"_id": "id", "text": "string"})
+
+        # callers get their own copy
+        columns["extra"] = "int"
+        self.assertNotIn("extra", db.cached_columns("t", auth))
+
+        # keyed by database
+        self.assertIsNone(db.cached_columns("t", {"dbid": "db2"}))
+
+        db.forget_columns("t", auth)
+        self.assertIsNone(db.cached_columns("t", auth))
+
+    def test_schema_cache_expires(self):
+        auth = {"dbid": "db1"}
+        db.remember_columns("t", auth, {"_id": "id"})
+        with patch.object(db.time, 'monotonic', return_value=db.time.monotonic() + db.SCHEMA_CACHE_SECONDS + 1):
+            self.assertIsNone(db.cached_columns("t", auth))
+
+class FakeFeatureBase(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections = set()
+
+    def do_POST(self):
+        FakeFeatureBase.connections.add(self.client_address)
+        sql = self.rfile.read(int(self.headers['Content-Length'])).decode()
+        if self.headers.get('X-API-Key') != "token":
+            body, code = b"denied", 401
+        elif sql.startswith("SELECT"):
+            body, code = json.dumps({"schema": {"fields": [{"name": "_id"}]}, "data": [[1]]}).encode(), 200
+        else:
+            body, code = json.dumps({"error": "bad sql"}).encode(), 200
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class TestClientPool(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeFeatureBase)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.hostport = f"127.0.0.1:{self.server.server_port}"
+        FakeFeatureBase.connections.clear()
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_pooled_client(self):
+        pool = db.FeatureBaseClientPool()
+        client = pool.get(self.hostport, None, "token")
+        # an api key makes the stock client use https, the fake server is http
+        client.url = client.url.replace("https://", "http://")
+
+        for _ in range(3):
+            result = client.query("SELECT _id FROM t")
+            self.assertTrue(result.ok)
+            self.assertEqual(result.data, [[1]])
+        self.assertEqual(len(FakeFeatureBase.connections), 1)
+
+        result = client.query("DROP TABLE t")
+        self.assertFalse(result.ok)
+        self.assertEqual(result.error, "bad sql")
+
+        self.assertIs(pool.get(self.hostport, None, "token"), client)
+        self.assertEqual(pool.stats()['created'], 1)
+        self.assertEqual(pool.stats()['reused'], 1)
+
+        denied = db.PooledClient(self.hostport, apikey="other")
+        denied.url = denied.url.replace("https://", "http://")
+        with self.assertRaises(HTTPError):
+            denied.query("SELECT _id FROM t")
+
+        pool.clear()
+
+    def test_pool_eviction(self):
+        pool = db.FeatureBaseClientPool(maxsize=2, idle_seconds=60)
+        first = pool.get("host", "db1", "t")
+        pool.get("host", "db2", "t")
+        pool.get("host", "db3", "t")
+        self.assertEqual(pool.stats()['size'], 2)
+        self.assertIsNot(pool.get("host", "db1", "t"), first)
+
+        with patch.object(db.time, 'monotonic', return_value=db.time.monotonic() + 61):
+            pool.get("host", "db4", "t")
+        self.assertEqual(pool.stats()['size'], 1)
+        self.assertEqual(pool.stats()['evicted'], 4)
+
+class FakeWeaviateClient:
+
+    def __init__(self, **kwargs):
+        self.ready = True
+        self.closed = False
+
+    def is_ready(self):
+        return self.ready
+
+    def close(self):
+        self.closed = True
+
+
+class TestWeaviatePool(unittest.TestCase):
+
+    def setUp(self):
+        self.pool = db.WeaviateConnectionPool(maxsize=2, idle_seconds=60, check_seconds=10)
+        patcher = patch.object(db.weaviate, 'connect_to_wcs', FakeWeaviateClient)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reuse(self):
+        entry = self.pool.acquire("https://a", "t")
+        self.pool.release(entry)
+        again = self.pool.acquire("https://a", "t")
+        self.pool.release(again)
+
+        self.assertIs(again.client, entry.client)
+        self.assertEqual(self.pool.stats()['created'], 1)
+        self.assertEqual(self.pool.stats()['reused'], 1)
+
+    def test_failed_health_check(self):
+        entry = self.pool.acquire("https://a", "t")
+        self.pool.release(entry)
+        entry.client.ready = False
+
+        # checked again only once check_seconds have passed
+        with patch.object(db.time, 'monotonic', return_value=db.time.monotonic() + 11):
+            fresh = self.pool.acquire("https://a", "t")
+        self.pool.release(fresh)
+
+        self.assertIsNot(fresh.client, entry.client)
+        self.assertTrue(entry.client.closed)
+        self.assertEqual(self.pool.stats()['failed_checks'], 1)
+
+    def test_eviction_skips_clients_in_use(self):
+        busy = self.pool.acquire("https://a", "t")
+        for url in ("https://b", "https://c"):
+            self.pool.release(self.pool.acquire(url, "t"))
+
+        self.assertFalse(busy.client.closed)
+        self.assertEqual(self.pool.stats()['size'], 2)
+        self.assertEqual(self.pool.stats()['in_use'], 1)
+        self.pool.release(busy)
+
+        with patch.object(db.time, 'monotonic', return_value=db.time.monotonic() + 61):
+            self.pool.release(self.pool.acquire("https://d", "t"))
+        self.assertTrue(busy.client.closed)
+        self.assertEqual(self.pool.stats()['size'], 1)
+
+    def test_search_batch_order(self):
+        app = Flask(__name__)
+        running = []
+        peak = []
+
+        def search(query, delay):
+            running.append(query)
+            peak.append(len(running))
+            db.time.sleep(delay)
+            running.remove(query)
+            return [{"properties": {"q": query}}]
+
+        searches = [{"query": i, "delay": 0.05 * (5 - i)} for i in range(5)]
+        with app.app_context():
+            results = db.weaviate_search_batch(search, searches, workers=3)
+
+        self.assertEqual([result[0]["properties"]["q"] for result in results], list(range(5)))
+        self.assertLessEqual(max(peak), 3)
+        self.assertGreater(max(peak), 1)
+
+    def test_connection_error_discards(self):
+        with patch.object(db, 'weaviate_pool', self.pool):
+            with self.assertRaises(RuntimeError):
+                with db.weaviate_connection({"weaviate_url": "https://a", "weaviate_token": "t"}) as client:
+                    client.ready = False
+                    raise RuntimeError("lost")
+
+        self.assertTrue(client.closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
+    def test_failed_search_discards(self):
+        auth = {"weaviate_url": "https://a", "weaviate_token": "t"}
+        entry = self.pool.acquire("https://a", "t")
+        self.pool.release(entry)
+        entry.client.ready = False
+
+        # the search error is returned, and the broken client leaves the pool
+        with patch.object(db, 'weaviate_pool', self.pool):
+            result = db.weaviate_similarity("docs", [0.1, 0.2], auth=auth)
+
+        self.assertEqual(result[0], False)
+        self.assertIn("error", result[1])
+        self.assertTrue(entry.client.closed)
+        self.assertEqual(self.pool.stats()['size'], 0)
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,160 @@
+import os
+import sys
+import tempfile
+import unittest
+import threading
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from unittest.mock import patch
+
+from flask import Flask
+
+import SlothAI.lib.embeddings as embeddings
+from SlothAI.lib.tasks import RetriableError
+from SlothAI.lib.blobs import LocalBlobStore
+
+class RateLimited(Exception):
+    status_code = 429
+
+
+class TestEmbeddings(unittest.TestCase):
+
+    def setUp(self):
+        embeddings._in_flight.clear()
+
+    def test_pack_batches(self):
+        texts = ["a" * 40] * 10
+        # 11 estimated tokens each
+        self.assertEqual(embeddings.pack_batches(texts, 4, 1000), [(0, 4), (4, 8), (8, 10)])
+        self.assertEqual(embeddings.pack_batches(texts, 100, 30), [(0, 2), (2, 4), (4, 6), (6, 8), (8, 10)])
+        self.assertEqual(embeddings.pack_batches(["a" * 400, "b"], 100, 30), [(0, 1), (1, 2)])
+        self.assertEqual(embeddings.pack_batches([], 100, 30), [])
+
+    def test_order_and_in_flight(self):
+        lock = threading.Lock()
+        running = [0, 0]
+
+        def embed(batch):
+            with lock:
+                running[0] += 1
+                running[1] = max(running)
+            embeddings.time.sleep(0.01)
+            with lock:
+                running[0] -= 1
+            return [[float(text)] for text in batch]
+
+        texts = [str(i) for i in range(50)]
+        vectors = embeddings.embed_batches(embed, texts, "openai", batch_size=3, in_flight=2)
+
+        self.assertEqual(vectors, [[float(i)] for i in range(50)])
+        self.assertLessEqual(running[1], 2)
+
+    def test_in_flight_limit_per_size(self):
+        self.assertIs(embeddings.in_flight_limit("openai", 2), embeddings.in_flight_limit("openai", 2))
+
+        # a node asking for another limit gets it, not the first caller's
+        wide = embeddings.in_flight_limit("openai", 8)
+        self.assertIsNot(wide, embeddings.in_flight_limit("openai", 2))
+        for _ in range(8):
+            self.assertTrue(wide.acquire(blocking=False))
+        self.assertFalse(wide.acquire(blocking=False))
+
+    def test_rate_limit_backoff(self):
+        calls = []
+
+        def embed(batch):
+            calls.append(batch)
+            if len(calls) < 3:
+                raise RateLimited("slow down")
+            return [[1.0] for _ in batch]
+
+        with patch.object(embeddings.time, 'sleep') as sleep:
+            vectors = embeddings.embed_batches(embed, ["x", "y"], "mistral")
+        self.assertEqual(vectors, [[1.0], [1.0]])
+        self.assertEqual(sleep.call_count, 2)
+
+        def limited(batch):
+            raise RateLimited("slow down")
+
+        with patch.object(embeddings.time, 'sleep'):
+            with self.assertRaises(RetriableError):
+                embeddings.embed_batches(limited, ["x"], "gemini", attempts=2)
+
+    def test_other_errors_are_not_retried(self):
+        calls = []
+
+        def embed(batch):
+            calls.append(batch)
+            raise ValueError("bad input")
+
+        with self.assertRaises(ValueError):
+            embeddings.embed_batches(embed, ["x"], "openai")
+        self.assertEqual(len(calls), 1)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+
+    def setUp(self):
+        embeddings._in_flight.clear()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.app = Flask(__name__)
+
+    def caches(self):
+        return [
+            embeddings.SQLiteEmbeddingCache(os.path.join(self.tmp.name, "cache.db")),
+            embeddings.BlobEmbeddingCache(LocalBlobStore(os.path.join(self.tmp.name, "blobs")))
+        ]
+
+    def test_pack_vector(self):
+        vector = [0.5, -1.25, 3.0]
+        self.assertEqual(embeddings.unpack_vector(embeddings.pack_vector(vector)), vector)
+        self.assertEqual(len(embeddings.pack_vector(vector)), 12)
+
+    def test_cache_key(self):
+        key = embeddings.cache_key("models/embedding-001", "retrieval_query", "hello")
+        self.assertTrue(key.startswith("models_embedding-001-retrieval_query-"))
+        self.assertNotEqual(key, embeddings.cache_key("models/embedding-001", "retrieval_document", "hello"))
+
+    def test_only_misses_are_embedded(self):
+        for cache in self.caches():
+            calls = []
+
+            def embed(batch):
+                calls.append(list(batch))
+                return [[float(len(text)), 0.5] for text in batch]
+
+            with self.app.app_context():
+                first = embeddings.cached_embed_batches(embed, ["a", "bb", "a"], "openai", cache, "ada")
+                second = embeddings.cached_embed_batches(embed, ["bb", "ccc", "a"], "openai", cache, "ada")
+
+            self.assertEqual(first, [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]])
+            self.assertEqual(second, [[2.0, 0.5], [3.0, 0.5], [1.0, 0.5]])
+            self.assertEqual(calls, [["a", "bb"], ["ccc"]])
+
+    def test_hits_match_misses(self):
+        for cache in self.caches():
+            def embed(batch):
+                return [[0.1, 1 / 3.0] for text in batch]
+
+            with self.app.app_context():
+                miss = embeddings.cached_embed_batches(embed, ["a"], "openai", cache, "ada")
+                hit = embeddings.cached_embed_batches(embed, ["a"], "openai", cache, "ada")
+
+            self.assertEqual(miss, hit)
+            self.assertNotEqual(miss, [[0.1, 1 / 3.0]])
+
+    def test_sqlite_expiry(self):
+        cache = embeddings.SQLiteEmbeddingCache(os.path.join(self.tmp.name, "cache.db"))
+        cache.put_many({"old": b"1234", "new": b"5678"})
+        with patch.object(embeddings.time, 'time', return_value=embeddings.time.time() + 3600):
+            cache.get_many(["new"])
+            cache.delete_older_than(minutes=30)
+        self.assertEqual(cache.get_many(["old", "new"]), {"new": b"5678"})
+
+
+if __name__ == '__main__':
+    unittest.main()
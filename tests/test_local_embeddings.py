@@ -0,0 +1,49 @@
+import os
+import sys
+import unittest
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+import numpy as np
+
+import SlothAI.lib.local_embeddings as local_embeddings
+
+class TestLocalEmbeddings(unittest.TestCase):
+
+    def test_hashing_embedder(self):
+        embedder = local_embeddings.HashingEmbedder(dimensions=64)
+        vectors = embedder.encode(["the cat sat", "the cat sat down", "quarterly tax filings", ""])
+
+        self.assertEqual(vectors.shape, (4, 64))
+        self.assertAlmostEqual(float(np.linalg.norm(vectors[0])), 1.0, places=5)
+        self.assertEqual(float(np.linalg.norm(vectors[3])), 0.0)
+
+        # deterministic, and closer for texts that share words
+        self.assertTrue(np.array_equal(vectors[0], embedder.encode(["the cat sat"])[0]))
+        self.assertGreater(vectors[0] @ vectors[1], vectors[0] @ vectors[2])
+
+    def test_embed_local_in_pool(self):
+        self.addCleanup(local_embeddings.shutdown)
+        texts = ["one", "two", "three"]
+        vectors = local_embeddings.embed_local("hashing", texts, workers=1)
+
+        self.assertEqual(len(vectors), 3)
+        self.assertEqual(len(vectors[0]), 384)
+        expected = local_embeddings.HashingEmbedder().encode(texts).tolist()
+        self.assertEqual(vectors, expected)
+
+    def test_workers_skip_the_app(self):
+        # spawned workers import the worker module, which must not load the app
+        code = "import sys, workers.embeddings; sys.exit('SlothAI' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=project_root).returncode, 0)
+
+    def test_model_names(self):
+        self.assertEqual(local_embeddings.local_model_name("local:all-MiniLM-L6-v2"), "all-MiniLM-L6-v2")
+        self.assertTrue(local_embeddings.is_available("hashing"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+import os
+import sys
+import unittest
+from unittest.mock import patch
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+import SlothAI.web.models as models
+
+class FakeKey:
+    gets = 0
+    stored = {}
+
+    def __init__(self, kind, name):
+        self.name = name
+
+    def get(self):
+        FakeKey.gets += 1
+        return FakeKey.stored.get(self.name)
+
+class TestCachedDefinition(unittest.TestCase):
+
+    def setUp(self):
+        models.definition_cache.clear()
+        FakeKey.gets = 0
+        FakeKey.stored = {"Node:n1": models.DefinitionVersion(version="v1")}
+        patcher = patch.object(models.ndb, 'Key', FakeKey)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_hits_skip_load(self):
+        loads = []
+        def load():
+            loads.append(1)
+            return {"node_id": "n1"}
+
+        for _ in range(5):
+            self.assertEqual(models.cached_definition('Node', 'n1', 'u1', load), {"node_id": "n1"})
+
+        # the stamp is checked on every lookup, the definition loaded once
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(FakeKey.gets, 5)
+
+    def test_edit_is_seen_on_next_lookup(self):
+        models.cached_definition('Node', 'n1', 'u1', lambda: {"node_id": "n1"})
+
+        # edited by another worker
+        FakeKey.stored["Node:n1"] = models.DefinitionVersion(version="v2")
+        definition = models.cached_definition('Node', 'n1', 'u1', lambda: {"node_id": "n1", "name": "edited"})
+        self.assertEqual(definition, {"node_id": "n1", "name": "edited"})
+
+
+if __name__ == '__main__':
+    unittest.main()
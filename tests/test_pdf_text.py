@@ -0,0 +1,99 @@
+import os
+import sys
+import unittest
+import subprocess
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+import fitz
+
+import SlothAI.lib.pdf_text as pdf_text
+
+def make_pdf(pages):
+    doc = fitz.open()
+    for i in range(pages):
+        doc.new_page().insert_text((72, 72), f"page {i + 1}")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+class FakeBlob:
+    def __init__(self, name, data, generation=1):
+        self.name = name
+        self.data = data
+        self.generation = generation
+        self.downloads = 0
+
+    def download_to_file(self, file):
+        self.downloads += 1
+        file.write(self.data)
+
+class TestPDFText(unittest.TestCase):
+
+    def setUp(self):
+        pdf_text.page_cache.clear()
+        self.addCleanup(pdf_text.shutdown)
+
+    def test_page_shards(self):
+        pages = list(range(100))
+        shards = pdf_text.page_shards(pages, 4)
+        self.assertEqual(len(shards), 4)
+        self.assertEqual([page for shard in shards for page in shard], pages)
+
+        # too few pages to be worth splitting
+        self.assertEqual(pdf_text.page_shards(list(range(10)), 4), [list(range(10))])
+        self.assertEqual(pdf_text.page_shards([], 4), [])
+
+    def test_parallel_extraction_in_order(self):
+        blob = FakeBlob("uid/manual.pdf", make_pdf(40))
+        texts = pdf_text.blob_pdf_texts(blob, workers=2)
+
+        self.assertEqual(len(texts), 40)
+        self.assertEqual([text.strip() for text in texts], [f"page {i + 1}" for i in range(40)])
+
+    def test_page_cache(self):
+        blob = FakeBlob("uid/short.pdf", make_pdf(3))
+        texts = pdf_text.blob_pdf_texts(blob, workers=1)
+        self.assertEqual(pdf_text.blob_pdf_texts(blob, workers=1), texts)
+        self.assertEqual(pdf_text.blob_pdf_texts(blob, page_number=2, workers=1), texts[1:2])
+        self.assertEqual(blob.downloads, 1)
+
+        # a new generation of the file is read again
+        blob.generation = 2
+        pdf_text.blob_pdf_texts(blob, workers=1)
+        self.assertEqual(blob.downloads, 2)
+
+        # without the cache every call downloads
+        pdf_text.blob_pdf_texts(blob, workers=1, cache=False)
+        self.assertEqual(blob.downloads, 3)
+
+    def test_pools_by_size(self):
+        blob = FakeBlob("uid/manual.pdf", make_pdf(40))
+        pdf_text.blob_pdf_texts(blob, workers=2, cache=False)
+        pdf_text.blob_pdf_texts(blob, workers=3, cache=False)
+        self.assertEqual(sorted(pdf_text._pools), [2, 3])
+        self.assertEqual(pdf_text._pools[3]._max_workers, 3)
+
+    def test_workers_skip_the_app(self):
+        # spawned workers import the worker module, which must not load the app
+        code = "import sys, workers.pdf; sys.exit('SlothAI' in sys.modules)"
+        self.assertEqual(subprocess.run([sys.executable, "-c", code], cwd=project_root).returncode, 0)
+
+    def test_page_cache_bytes(self):
+        self.assertIsNotNone(pdf_text.page_cache.maxbytes)
+        blob = FakeBlob("uid/short.pdf", make_pdf(3))
+        pdf_text.blob_pdf_texts(blob, workers=1)
+        self.assertGreater(pdf_text.page_cache.stats()["bytes"], 0)
+
+    def test_page_number_errors(self):
+        blob = FakeBlob("uid/short.pdf", make_pdf(3))
+        with self.assertRaises(ValueError):
+            pdf_text.blob_pdf_texts(blob, page_number=4, workers=1)
+        with self.assertRaises(ValueError):
+            pdf_text.blob_pdf_texts(blob, page_number=0, workers=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
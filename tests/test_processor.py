@@ -0,0 +1,32 @@
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from SlothAI.lib.processor import render_extra
+
+class TestProcessor(unittest.TestCase):
+
+    def test_render_extra(self):
+        context = {
+            "text": ["It's a test."],
+            "username": "sloth",
+            "embedding": [[0.1, 0.2, 0.3]]
+        }
+
+        self.assertEqual(render_extra("Hello {{ username }}", context), "Hello sloth")
+        self.assertEqual(render_extra("{{ text[0] }}", context), "It's a test.")
+        self.assertEqual(render_extra("plain", context), "plain")
+        self.assertEqual(render_extra(5, context), 5)
+        self.assertIsNone(render_extra(None, context))
+        self.assertEqual(
+            render_extra({"q": ["{{ username }}", 2]}, context),
+            {"q": ["sloth", 2]}
+        )
+
+
+if __name__ == '__main__':
+    unittest.main()
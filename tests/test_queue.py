@@ -0,0 +1,81 @@
+import os
+import sys
+import threading
+import unittest
+import datetime
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from flask import Flask
+
+from SlothAI.lib.queue import LocalTaskQueue, QueueFullError
+from SlothAI.lib.tasks import Task, TaskState
+
+def make_task(task_id):
+    return Task(
+        id=task_id,
+        user_id="user",
+        pipe_id="pipe",
+        nodes=["node"],
+        document={"text": ["hello"]},
+        created_at=datetime.datetime.utcnow(),
+        retries=0,
+        error=None,
+        state=TaskState.RUNNING,
+        split_status=-1,
+        jump_status=-1
+    )
+
+class TestLocalTaskQueue(unittest.TestCase):
+
+    def test_runs_tasks_with_handler(self):
+        done = threading.Event()
+        seen = []
+
+        def handler(task):
+            seen.append(task.id)
+            if len(seen) == 3:
+                done.set()
+
+        task_queue = LocalTaskQueue(Flask(__name__), handler=handler, workers=2)
+        for i in range(3):
+            task_queue.queue(make_task(f"task{i}"))
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(sorted(seen), ["task0", "task1", "task2"])
+
+    def test_queued_task_is_a_copy(self):
+        done = threading.Event()
+
+        def handler(task):
+            task.document["text"].append("changed")
+            done.set()
+
+        task = make_task("task")
+        task_queue = LocalTaskQueue(Flask(__name__), handler=handler, workers=1)
+        task_queue.queue(task)
+
+        self.assertTrue(done.wait(5))
+        self.assertEqual(task.document["text"], ["hello"])
+
+    def test_backpressure_when_full(self):
+        release = threading.Event()
+
+        def handler(task):
+            release.wait(5)
+
+        task_queue = LocalTaskQueue(Flask(__name__), handler=handler, workers=1, capacity=1, timeout=0.1)
+        try:
+            # one task is taken by the worker, one waits, the next has no room
+            task_queue.queue(make_task("task0"))
+            task_queue.queue(make_task("task1"))
+            with self.assertRaises(QueueFullError):
+                task_queue.queue(make_task("task2"))
+        finally:
+            release.set()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import os
+import sys
+import unittest
+import datetime
+from unittest.mock import patch
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from flask import Flask
+
+import SlothAI.web.tasks as web_tasks
+from SlothAI.lib.tasks import Task, TaskState
+
+class FakeTaskService:
+    def __init__(self):
+        self.state = TaskState.RUNNING.value
+        self.deleted = False
+        self.queued = []
+        self.updates = []
+
+    def fetch_tasks(self, task_id):
+        if self.deleted:
+            return []
+        return [{'task_id': task_id, 'state': self.state}]
+
+    def queue_task(self, task):
+        self.queued.append(task)
+
+    def update_task(self, task_id, **kwargs):
+        self.updates.append(kwargs)
+
+class TestRunTask(unittest.TestCase):
+
+    def setUp(self):
+        self.app = Flask(__name__)
+        self.app.config['TASK_INLINE_SECONDS'] = 60
+        self.service = FakeTaskService()
+        self.app.config['task_service'] = self.service
+        self.ran = []
+
+    def task(self):
+        return Task(
+            id="t1", user_id="u1", pipe_id="p1", nodes=["n1", "n2", "n3"], document={},
+            created_at=datetime.datetime.utcnow(), retries=0, error=None,
+            state=TaskState.RUNNING, split_status=-1, jump_status=-1
+        )
+
+    def run_task(self, on_node):
+        def process(task):
+            self.ran.append(task.nodes[0])
+            on_node(task.nodes[0])
+            return task
+
+        with self.app.app_context(), patch.object(web_tasks, 'process', process):
+            return web_tasks.run_task(self.task())
+
+    def test_runs_nodes_inline(self):
+        self.run_task(lambda node: None)
+        self.assertEqual(self.ran, ["n1", "n2", "n3"])
+        self.assertEqual(self.service.updates, [{'state': TaskState.COMPLETED}])
+
+    def test_stops_when_cancelled(self):
+        def cancel(node):
+            if node == "n1":
+                self.service.state = TaskState.CANCELED.value
+
+        _, status = self.run_task(cancel)
+        self.assertEqual(status, 200)
+        self.assertEqual(self.ran, ["n1"])
+        self.assertEqual(self.service.queued, [])
+        self.assertEqual(self.service.updates, [])
+
+    def test_stops_when_deleted(self):
+        def delete(node):
+            if node == "n2":
+                self.service.deleted = True
+
+        body, _ = self.run_task(delete)
+        self.assertEqual(body, "Task not found")
+        self.assertEqual(self.ran, ["n1", "n2"])
+        self.assertEqual(self.service.updates, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
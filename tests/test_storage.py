@@ -0,0 +1,156 @@
+import os
+import sys
+import sqlite3
+import tempfile
+import unittest
+import datetime
+from unittest.mock import patch
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+import SlothAI.lib.storage as storage
+from SlothAI.lib.storage import SQLiteTaskStore, NDBTaskStore
+from SlothAI.lib.tasks import TaskState
+
+class TestSQLiteTaskStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = SQLiteTaskStore(path=os.path.join(self.tmp.name, "tasks.db"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def create(self, task_id, user_id="user", state=TaskState.RUNNING, created_at=None):
+        return self.store.create(
+            task_id=task_id,
+            user_id=user_id,
+            current_node_id="node",
+            pipe_id="pipe",
+            created_at=created_at or datetime.datetime.utcnow(),
+            state=state,
+            error=None,
+            retries=0,
+            split_status=-1,
+            jump_status=-1
+        )
+
+    def test_create_fetch_update(self):
+        self.create("task0")
+
+        tasks = self.store.fetch(task_id="task0")
+        self.assertEqual(len(tasks), 1)
+        self.assertEqual(tasks[0]['state'], TaskState.RUNNING.value)
+        self.assertIsInstance(tasks[0]['created_at'], datetime.datetime)
+
+        task = self.store.update("task0", state=TaskState.COMPLETED, split_status=10, jump_status=2)
+        self.assertEqual(task['state'], TaskState.COMPLETED.value)
+        self.assertEqual(task['split_status'], 10)
+        self.assertEqual(task['jump_status'], 2)
+
+        with self.assertRaises(Exception):
+            self.store.update("missing", state=TaskState.FAILED)
+
+    def test_create_multi_is_atomic(self):
+        tasks = [{
+            'task_id': task_id, 'user_id': "user", 'current_node_id': "node", 'pipe_id': "pipe",
+            'created_at': datetime.datetime.utcnow(), 'state': TaskState.RUNNING, 'error': None,
+            'retries': 0, 'split_status': -1, 'jump_status': -1
+        } for task_id in ["task0", "task1", "task0"]]
+
+        # the duplicate third task fails the batch, and none of it is kept
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.store.create_multi(tasks)
+        self.assertEqual(self.store.fetch(user_id="user"), [])
+
+        # the connection is usable afterwards
+        self.store.create_multi(tasks[:2])
+        self.assertEqual(len(self.store.fetch(user_id="user")), 2)
+
+    def test_fetch_task_ids(self):
+        for i in range(3):
+            self.create(f"task{i}", user_id="other" if i == 2 else "user")
+
+        tasks = self.store.fetch(task_ids=["task0", "task2", "missing"])
+        self.assertEqual(sorted(t['task_id'] for t in tasks), ["task0", "task2"])
+        self.assertEqual([t['task_id'] for t in self.store.fetch(task_ids=["task0", "task2"], user_id="user")], ["task0"])
+        self.assertEqual(self.store.fetch(task_ids=[]), [])
+
+    def test_delete_by_states(self):
+        self.create("task0", state=TaskState.COMPLETED)
+        self.create("task1", state=TaskState.FAILED)
+        self.create("task2", state=TaskState.RUNNING)
+        self.create("task3", user_id="other", state=TaskState.COMPLETED)
+
+        ok = self.store.delete(user_id="user", states=[TaskState.COMPLETED.value, TaskState.FAILED.value])
+        self.assertTrue(ok)
+        self.assertEqual([t['task_id'] for t in self.store.fetch(user_id="user")], ["task2"])
+        self.assertEqual(len(self.store.fetch(user_id="other")), 1)
+
+    def test_delete_older_than(self):
+        self.create("old", created_at=datetime.datetime.utcnow() - datetime.timedelta(hours=2))
+        self.create("new")
+
+        self.store.delete_older_than(hours=1)
+        self.assertEqual(self.store.fetch(task_id="old"), [])
+        self.assertEqual(len(self.store.fetch(task_id="new")), 1)
+
+
+class FakeEntity:
+    def __init__(self, id, task_id):
+        self.key = self
+        self._id = id
+        self.task_id = task_id
+
+    def id(self):
+        return self._id
+
+    def to_dict(self):
+        return {"task_id": self.task_id}
+
+class FakeCursor:
+    def __init__(self, position=0, urlsafe=None):
+        self.position = int(urlsafe) if urlsafe else position
+
+    def urlsafe(self):
+        return str(self.position).encode('ascii')
+
+class FakeQuery:
+    def __init__(self, entities):
+        self.entities = entities
+
+    def order(self, *args):
+        return self
+
+    def fetch_page(self, size, start_cursor=None):
+        start = start_cursor.position if start_cursor else 0
+        page = self.entities[start:start + size]
+        return page, FakeCursor(start + len(page)), start + size < len(self.entities)
+
+class TestMigrateKeys(unittest.TestCase):
+
+    def migrate(self, entities, **kwargs):
+        deleted = []
+        with patch.object(NDBTaskStore, 'query', lambda: FakeQuery(entities)), \
+                patch.object(storage.ndb, 'Cursor', FakeCursor), \
+                patch.object(storage.ndb, 'put_multi'), \
+                patch.object(storage.ndb, 'delete_multi', deleted.extend):
+            return NDBTaskStore.migrate_keys(**kwargs), deleted
+
+    def test_resumes_past_tasks_without_task_id(self):
+        # integer ids sort before keyed tasks. none of these have a task_id.
+        entities = [FakeEntity(i, None) for i in range(10)] + [FakeEntity(10, "t10"), FakeEntity("t0", "t0")]
+
+        (migrated, cursor, done), deleted = self.migrate(entities, batch_size=2, max_batches=2)
+        self.assertEqual((migrated, cursor, done), (0, "4", False))
+        self.assertEqual(len(deleted), 4)
+
+        (migrated, cursor, done), deleted = self.migrate(entities, batch_size=2, max_batches=10, cursor=cursor)
+        self.assertEqual((migrated, cursor, done), (1, None, True))
+        self.assertEqual([entity.id() for entity in deleted], [4, 5, 6, 7, 8, 9, 10])
+
+
+if __name__ == '__main__':
+    unittest.main()
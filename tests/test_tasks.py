@@ -6,7 +6,9 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.abspath(os.path.join(current_dir, '..'))
 sys.path.append(project_root)
 
-from SlothAI.lib.tasks import process_data_dict_for_insert
+from datetime import datetime
+
+from SlothAI.lib.tasks import Task, TaskState, process_data_dict_for_insert
 from SlothAI.lib.schemar import FBTypes
 
 class TestTasks(unittest.TestCase):
@@ -145,6 +147,67 @@ class TestTasks(unittest.TestCase):
             self.assertEqual(case['columns'], columns, f"\n\nFAILURE: test named {case['name']} failed.")
             self.assertListEqual(case['records'], records, f"\n\nFAILURE: test named {case['name']} failed.")
 
+    def test_process_data_dict_for_insert_columns(self):
+        data = {
+            "created": ["2024-01-02", "2024-01-03", "01/04/2024", "nope"],
+            "page_num": [1, 2, 3, 4],
+            "tags": [["a'b"], ["c"], ["d"], ["e"]],
+        }
+        column_type_map = {
+            "_id": FBTypes.STRING,
+            "created": FBTypes.TIMESTAMP,
+            "page_num": FBTypes.INT,
+            "tags": FBTypes.STRINGSET,
+        }
+        columns, records = process_data_dict_for_insert(data, column_type_map, "t")
+
+        self.assertEqual(columns, ["_id", "created", "page_num", "tags"])
+        self.assertRegex(records[0], r"^\('[A-Za-z0-9]{6}',")
+        self.assertTrue(records[0].endswith(",'2024-01-02T00:00:00.000000+00:00',1,['a''b'])"))
+        self.assertIn("'2024-01-04T00:00:00.000000+00:00',3,", records[2])
+        self.assertIn("'None',4,", records[3])
+
+        # values are quoted without changing the caller's data
+        self.assertEqual(data["tags"][0], ["a'b"])
+
+    def test_wire_roundtrip(self):
+        embedding = [i / 7.0 for i in range(64)]
+        task = Task(
+            id="t1", user_id="u1", pipe_id="p1", nodes=["n1", "n2"],
+            document={"text": ["hello"], "embedding": [embedding], "count": [1.5, 2.5], "price": [19.99 + i for i in range(40)]},
+            created_at=datetime.utcnow(), retries=0, error=None,
+            state=TaskState.RUNNING, split_status=-1, jump_status=-1
+        )
+
+        for encoding in ("json", "compact", "compact+zlib"):
+            decoded = Task.from_wire(task.to_wire(encoding), encoding)
+            self.assertEqual(decoded.nodes, ["n1", "n2"])
+            self.assertEqual(decoded.document["text"], ["hello"])
+            self.assertEqual(decoded.document["count"], [1.5, 2.5])
+            # packed float lists come back exactly, embeddings or not
+            self.assertEqual(decoded.document["embedding"], [embedding])
+            self.assertEqual(decoded.document["price"], [19.99 + i for i in range(40)])
+
+        self.assertLess(len(task.to_wire("compact+zlib")), len(task.to_wire("json")))
+
+    def test_wire_roundtrip_marker_keys(self):
+        # user objects shaped like a packed list come back unchanged
+        document = {
+            "meta": [{"__f64__": "abc"}, {"__f32__": [1.0, 2.0]}, {"__esc____f64__": 1}],
+            "__esc__": ["x"],
+            "embedding": [[i / 3.0 for i in range(32)]]
+        }
+        task = Task(
+            id="t1", user_id="u1", pipe_id="p1", nodes=["n1"],
+            document=document,
+            created_at=datetime.utcnow(), retries=0, error=None,
+            state=TaskState.RUNNING, split_status=-1, jump_status=-1
+        )
+
+        for encoding in ("compact", "compact+zlib"):
+            decoded = Task.from_wire(task.to_wire(encoding), encoding)
+            self.assertEqual(decoded.document, document)
+
 
 if __name__ == '__main__':
-    unittest.main()
\ No newline at end of file
+    unittest.main()
@@ -0,0 +1,47 @@
+import os
+import sys
+import unittest
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+project_root = os.path.abspath(os.path.join(current_dir, '..'))
+sys.path.append(project_root)
+
+from SlothAI.lib.template import Template
+
+template_text = """{# Process a document #}
+input_fields = [{'name': "text", 'type': "strings"}]
+output_fields = [{'name': "summary", 'type': "strings"}]
+
+extras = {'model': "gpt-3.5-turbo", 'openai_token': None, 'prompt': "{{ text }}"}
+
+Summarize: {{ text }}
+"""
+
+class TestTemplate(unittest.TestCase):
+
+    def test_remove_fields_and_extras(self):
+        body = Template.remove_fields_and_extras(template_text)
+        self.assertNotIn("input_fields", body)
+        self.assertNotIn("output_fields", body)
+        self.assertNotIn("extras", body)
+        self.assertIn("Summarize: {{ text }}", body)
+
+    def test_fields_from_template(self):
+        input_fields, output_fields = Template.fields_from_template(template_text)
+        self.assertEqual(input_fields, [{'name': "text", 'type': "strings"}])
+        self.assertEqual(output_fields, [{'name': "summary", 'type': "strings"}])
+
+        # cached results must not leak changes made by callers
+        input_fields.append({'name': "other"})
+        input_fields, _ = Template.fields_from_template(template_text)
+        self.assertEqual(len(input_fields), 1)
+
+    def test_extras_from_template(self):
+        extras = Template.extras_from_template(template_text)
+        self.assertEqual(extras['model'], "gpt-3.5-turbo")
+        self.assertEqual(extras['prompt'], "{{ text }}")
+        self.assertIsNone(extras['openai_token'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,6 @@
+"""
+Functions run in worker processes. Pools are spawned, and a spawned process
+imports the module of each function it runs. Modules here stay outside the
+SlothAI package and don't import it, so workers start without loading the
+app, its Datastore client or its credentials.
+"""
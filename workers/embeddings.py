@@ -0,0 +1,45 @@
+import re
+import hashlib
+
+import numpy as np
+
+
+class HashingEmbedder:
+    """
+    Embeds text by hashing its words and word pairs into `dimensions` signed
+    buckets. Texts sharing words get similar vectors. Vectors are unit length.
+    Dependency free, for tests. It is no replacement for a trained model.
+    """
+    def __init__(self, dimensions=384):
+        self.dimensions = dimensions
+
+    def _features(self, text):
+        words = re.findall(r'\w+', str(text).lower())
+        return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+    def encode(self, texts):
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = int.from_bytes(hashlib.blake2b(feature.encode('utf-8'), digest_size=8).digest(), 'little')
+                sign = 1.0 if digest >> 63 else -1.0
+                vectors[row, digest % self.dimensions] += sign
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+# the model of a pool worker process
+_model = None
+
+def load_model(name):
+    global _model
+    if name == "hashing":
+        _model = HashingEmbedder()
+    else:
+        from sentence_transformers import SentenceTransformer
+        _model = SentenceTransformer(name, device="cpu")
+
+def encode(texts):
+    return np.asarray(_model.encode(texts), dtype=np.float32).tolist()
@@ -0,0 +1,7 @@
+import fitz
+
+
+def extract_pages(path, pages):
+    # texts of `pages` (0-based) of the PDF at `path`, in order
+    with fitz.open(path) as doc:
+        return [doc.load_page(page).get_text() for page in pages]